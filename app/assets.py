@@ -0,0 +1,169 @@
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
+from pathlib import Path
+
+import anyio
+from jinja2 import pass_context
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # .br siblings are optional; gzip is always written
+    brotli = None
+
+STATIC_DIR = Path("static")
+
+# Already-compressed formats gain nothing from gzip/brotli.
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".svg", ".ico", ".json", ".webmanifest", ".txt"}
+COMPRESSED_SUFFIXES = {".gz": "gzip", ".br": "br"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _fingerprint(relative: Path, digest: str) -> str:
+    return relative.with_name(f"{relative.stem}.{digest}{relative.suffix}").as_posix()
+
+
+def _write_if_stale(source: Path, target: Path, data: bytes) -> None:
+    if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+        return
+    # Every worker builds at import and the file may already be served with
+    # an immutable Cache-Control, so it must never be seen half-written.
+    temp = target.with_name(f".{target.name}.{os.getpid()}")
+    try:
+        temp.write_bytes(data)
+        temp.replace(target)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def build_assets(static_dir: Path = STATIC_DIR) -> dict[str, str]:
+    # Maps each asset path (relative to static_dir) to its content-hashed name
+    # and writes .gz/.br siblings next to compressible files.
+    manifest = {}
+    for path in sorted(static_dir.rglob("*")):
+        if (
+            not path.is_file()
+            or path.suffix in COMPRESSED_SUFFIXES
+            or path.name.startswith(".")  # another worker's in-progress write
+        ):
+            continue
+        data = path.read_bytes()
+        relative = path.relative_to(static_dir)
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        manifest[relative.as_posix()] = _fingerprint(relative, digest)
+
+        if path.suffix in COMPRESSIBLE_SUFFIXES:
+            _write_if_stale(
+                path,
+                path.with_name(path.name + ".gz"),
+                gzip.compress(data, compresslevel=9, mtime=0),
+            )
+            if brotli is not None:
+                _write_if_stale(
+                    path,
+                    path.with_name(path.name + ".br"),
+                    brotli.compress(data, quality=11),
+                )
+    return manifest
+
+
+def _accepted_encodings(scope: Scope) -> set[str]:
+    header = Headers(scope=scope).get("accept-encoding", "")
+    encodings = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    # Serves fingerprinted names from the manifest with immutable caching and
+    # picks a precompressed .br/.gz sibling when the client accepts it.
+    # FileResponse already uses the ASGI pathsend extension (zero-copy
+    # sendfile) when the server supports it.
+    def __init__(self, *, manifest: dict[str, str], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.fingerprinted = {hashed: original for original, hashed in manifest.items()}
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        original = self.fingerprinted.get(path)
+        if original is None:
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("Cache-Control", "no-cache")
+            return response
+
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405, headers={"Allow": "GET, HEAD"})
+
+        accepted = _accepted_encodings(scope)
+        for suffix, encoding in (".br", "br"), (".gz", "gzip"):
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path,
+                original + suffix,
+            )
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                return self._asset_response(
+                    full_path,
+                    stat_result,
+                    scope,
+                    original,
+                    encoding,
+                )
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, original)
+        if not (stat_result and stat.S_ISREG(stat_result.st_mode)):
+            raise HTTPException(status_code=404)
+        return self._asset_response(full_path, stat_result, scope, original, None)
+
+    def _asset_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        original: str,
+        encoding: str | None,
+    ) -> Response:
+        media_type, _ = mimetypes.guess_type(original)
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        response = FileResponse(
+            full_path,
+            stat_result=stat_result,
+            media_type=media_type or "application/octet-stream",
+            headers=headers,
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def make_static_url(manifest: dict[str, str]):
+    @pass_context
+    def static_url(context: dict, path: str):
+        return context["request"].url_for("static", path=manifest.get(path, path))
+
+    return static_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fingerprint and precompress everything under static/.",
+    )
+    parser.parse_args()
+    for original, hashed in build_assets().items():
+        print(f"{original} -> {hashed}")
@@ -1,89 +1,302 @@
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
-from typing import Annotated
+from typing import Annotated, NamedTuple, TypeVar
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from pwdlib import PasswordHash
-from sqlalchemy import select
+from sqlalchemy import inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
 from app.config import settings
-from app.database import get_db
+from app.database import get_read_db
+from app.instrumentation import timed
+from app.metrics import PASSWORD_HASH_DURATION, TOKEN_VERIFICATION_FAILURES
 from app.models import User
 
-password_hash = PasswordHash.recommended()
+
+@functools.cache
+def password_hasher():
+    # pwdlib pulls in argon2-cffi; import it on first use rather than on
+    # every worker start, since most requests never hash anything.
+    from pwdlib import PasswordHash
+
+    return PasswordHash.recommended()
+
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token")
 
+# Verified access token -> TokenClaims, kept until the token's own exp.
+token_cache = TTLCache(maxsize=settings.token_cache_size, name="token")
+# User rows by id; short-lived and invalidated on user writes.
+user_cache = TTLCache(
+    maxsize=settings.user_cache_size,
+    ttl=settings.user_cache_ttl_seconds,
+    name="user",
+)
+# User id -> token_version. Revocations made by another worker take effect
+# once the entry expires.
+token_version_cache = TTLCache(
+    maxsize=settings.user_cache_size,
+    ttl=settings.token_version_cache_ttl_seconds,
+    name="token_version",
+)
+
+
+T = TypeVar("T")
+
+
+class PasswordHashPool:
+    # Runs Argon2 off the event loop on a fixed set of threads (argon2-cffi
+    # releases the GIL) and sheds load once too many hashes are waiting.
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.max_pending = workers + queue_size
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="password-hash",
+        )
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with timed("hash"):
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+hash_pool = PasswordHashPool(
+    workers=settings.password_hash_workers,
+    queue_size=settings.password_hash_queue_size,
+)
+
 
 def hash_password(password: str) -> str:
-    return password_hash.hash(password)
+    with PASSWORD_HASH_DURATION.labels("hash").time():
+        return password_hasher().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_hash.verify(plain_password, hashed_password)
+    with PASSWORD_HASH_DURATION.labels("verify").time():
+        return password_hasher().verify(plain_password, hashed_password)
 
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(UTC) + expires_delta
-    else:
-        expire = datetime.now(UTC) + timedelta(
-            minutes=settings.access_token_expire_minutes,
-        )
-    to_encode.update({"exp": expire})
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+class TokenClaims(NamedTuple):
+    user_id: int
+    username: str
+    version: int
+
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+def _encode_token(user: User, token_type: str, expires_delta: timedelta) -> str:
+    # "ver" is the user's token_version when the token was issued; bumping
+    # the column revokes every token issued before.
+    payload = {
+        "sub": str(user.id),
+        "name": user.username,
+        "ver": user.token_version,
+        "type": token_type,
+        "exp": datetime.now(UTC) + expires_delta,
+    }
     return jwt.encode(
-        to_encode,
+        payload,
         settings.secret_key.get_secret_value(),
         algorithm=settings.algorithm,
     )
 
 
-def verify_access_token(token: str) -> str | None:
+def create_access_token(user: User, expires_delta: timedelta | None = None) -> str:
+    if expires_delta is None:
+        expires_delta = timedelta(minutes=settings.access_token_expire_minutes)
+    return _encode_token(user, ACCESS, expires_delta)
+
+
+def create_refresh_token(user: User) -> str:
+    return _encode_token(
+        user,
+        REFRESH,
+        timedelta(days=settings.refresh_token_expire_days),
+    )
+
+
+def _decode_token(
+    token: str,
+    token_type: str,
+    count_failures: bool = True,
+) -> tuple[TokenClaims, float] | None:
     try:
         payload = jwt.decode(
             token,
             settings.secret_key.get_secret_value(),
             algorithms=[settings.algorithm],
-            options={"require": ["exp", "sub"]},
+            options={"require": ["exp", "sub", "ver", "type"]},
         )
-    except jwt.InvalidTokenError:
+        if payload["type"] != token_type:
+            raise jwt.InvalidTokenError("wrong token type")
+        claims = TokenClaims(
+            int(payload["sub"]),
+            payload.get("name", ""),
+            int(payload["ver"]),
+        )
+    except jwt.ExpiredSignatureError:
+        if count_failures:
+            TOKEN_VERIFICATION_FAILURES.labels("expired").inc()
+        return None
+    except (jwt.InvalidTokenError, TypeError, ValueError):
+        if count_failures:
+            TOKEN_VERIFICATION_FAILURES.labels("invalid").inc()
+        return None
+    return claims, payload["exp"]
+
+
+def verify_access_token(
+    token: str,
+    count_failures: bool = True,
+) -> TokenClaims | None:
+    # Callers that only peek at the token, like the rate limiter, pass
+    # count_failures=False so a bad token is counted once, by the auth check.
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+
+    decoded = _decode_token(token, ACCESS, count_failures)
+    if decoded is None:
         return None
-    return payload.get("sub")
+    claims, expires_at = decoded
+    token_cache.set(token, claims, expires_at=expires_at)
+    return claims
+
+
+def verify_refresh_token(token: str) -> TokenClaims | None:
+    decoded = _decode_token(token, REFRESH)
+    return decoded[0] if decoded is not None else None
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    user_cache.pop(user_id)
+    token_version_cache.pop(user_id)
+
+
+def auth_cache_stats() -> dict[str, dict[str, int]]:
+    return {
+        "token": token_cache.stats(),
+        "user": user_cache.stats(),
+        "token_version": token_version_cache.stats(),
+    }
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _verified_claims(token: str) -> TokenClaims:
+    claims = verify_access_token(token)
+    if claims is None:
+        raise _unauthorized("Invalid or expired token")
+    return claims
+
+
+def _snapshot(user: User) -> User:
+    # The cached user is shared by concurrent requests, so it must not be the
+    # instance a session tracks: handlers edit that one before committing, and
+    # a rollback expires it. A transient copy of the columns is neither.
+    return User(
+        **{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs},
+    )
+
+
+async def load_user(db: AsyncSession, user_id: int) -> User | None:
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    result = await db.execute(select(User).where(User.id == user_id))
+    row = result.scalars().first()
+    if row is None:
+        return None
+    user = _snapshot(row)
+    user_cache.set(user_id, user)
+    token_version_cache.set(user_id, user.token_version)
+    return user
+
+
+async def current_token_version(db: AsyncSession, user_id: int) -> int | None:
+    version = token_version_cache.get(user_id)
+    if version is not None:
+        return version
+
+    version = await db.scalar(select(User.token_version).where(User.id == user_id))
+    if version is not None:
+        token_version_cache.set(user_id, version)
+    return version
 
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
 ) -> User:
-    user_id = verify_access_token(token)
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    try:
-        user_id_int = int(user_id)
-    except (TypeError, ValueError):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    result = await db.execute(select(User).where(User.id == user_id_int))
-    user = result.scalars().first()
+    claims = _verified_claims(token)
+    user = await load_user(db, claims.user_id)
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("User not found")
+    # Not user.token_version: the user cache lives longer than the version
+    # cache, and revocations must reach other workers within the shorter TTL.
+    if await current_token_version(db, claims.user_id) != claims.version:
+        raise _unauthorized("Token has been revoked")
     return user
 
 
+async def get_token_claims(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+) -> TokenClaims:
+    # Trusts the signed claims and only checks the token version, which is
+    # nearly always answered from token_version_cache instead of the DB.
+    claims = _verified_claims(token)
+    version = await current_token_version(db, claims.user_id)
+    if version is None:
+        raise _unauthorized("User not found")
+    if version != claims.version:
+        raise _unauthorized("Token has been revoked")
+    return claims
+
+
+async def get_current_user_id(
+    claims: Annotated[TokenClaims, Depends(get_token_claims)],
+) -> int:
+    return claims.user_id
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentClaims = Annotated[TokenClaims, Depends(get_token_claims)]
+CurrentUserId = Annotated[int, Depends(get_current_user_id)]
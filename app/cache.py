@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.metrics import CACHE_LOOKUPS
+
+
+class TTLCache:
+    # Bounded LRU whose entries also expire, either after the default ttl or at
+    # an explicit unix timestamp passed to set(). Named caches also count
+    # lookups in the cache_lookups_total metric.
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        name: str | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._hit_metric = CACHE_LOOKUPS.labels(name, "hit") if name else None
+        self._miss_metric = CACHE_LOOKUPS.labels(name, "miss") if name else None
+        self._data: OrderedDict[Any, tuple[Any, float | None]] = OrderedDict()
+
+    def get(self, key: Any) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self._record_miss()
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            self._record_miss()
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        if self._hit_metric is not None:
+            self._hit_metric.inc()
+        return value
+
+    def _record_miss(self) -> None:
+        self.misses += 1
+        if self._miss_metric is not None:
+            self._miss_metric.inc()
+
+    def set(self, key: Any, value: Any, expires_at: float | None = None) -> None:
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
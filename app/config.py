@@ -10,7 +10,108 @@ class Settings(BaseSettings):
 
     secret_key: SecretStr
     algorithm: str = "HS256"
-    access_token_expire_minutes: int = 30
+    # Access tokens are short-lived so the claims in them stay fresh;
+    # clients renew them at POST /api/users/token/refresh.
+    access_token_expire_minutes: int = 15
+    refresh_token_expire_days: int = 14
+
+    token_cache_size: int = 10_000
+    user_cache_size: int = 10_000
+    user_cache_ttl_seconds: float = 30
+    token_version_cache_ttl_seconds: float = 5
+
+    password_hash_workers: int = 4
+    password_hash_queue_size: int = 64
+
+    posts_per_page: int = 20
+    max_posts_per_page: int = 100
+    feed_stream_batch_size: int = 10
+    # Serialize post lists straight from column rows instead of PostResponse.
+    fast_post_lists: bool = True
+
+    profile_image_workers: int = 2
+    max_profile_image_bytes: int = 5 * 1024 * 1024
+
+    # Group commit for POST /api/posts: rows are queued and inserted together
+    # every POST_WRITE_BATCH_SIZE rows or POST_WRITE_MAX_DELAY_MS.
+    post_write_behind: bool = False
+    post_write_batch_size: int = 100
+    post_write_max_delay_ms: float = 10
+    post_write_queue_size: int = 10_000
+
+    # Deleted accounts lose their posts this many rows per transaction, with
+    # a pause in between so writers in other processes get the lock.
+    post_purge_batch_size: int = 1_000
+    post_purge_pause_ms: float = 10
+    # The user row goes last, this long after the deletion: other workers
+    # accept the account's tokens for up to TOKEN_VERSION_CACHE_TTL_SECONDS
+    # and their write-behind queues may still hold its posts, so keep it well
+    # above that.
+    post_purge_grace_seconds: float = 30
+
+    # Live feed at /api/posts/stream. "redis" relays events between workers.
+    # A client that falls FEED_CLIENT_QUEUE_SIZE events behind is dropped.
+    feed_backend: str = "memory"  # or "redis"
+    feed_redis_url: str = "redis://localhost:6379/0"
+    feed_redis_channel: str = "posts:feed"
+    feed_client_queue_size: int = 256
+    feed_keepalive_seconds: float = 15
+
+    bulk_import_chunk_size: int = 1_000
+    export_batch_size: int = 1_000
+
+    # Compiled templates persist here across restarts; None keeps them in memory.
+    template_cache_dir: str | None = ".cache/jinja"
+    fragment_cache_size: int = 5_000
+
+    # Per-request query count and phase timings, as Server-Timing and logs.
+    instrumentation_enabled: bool = True
+    # Log statements at least this slow; None turns the slow-query log off.
+    slow_query_threshold_ms: float | None = None
+
+    # Token buckets: rates are requests per minute, bursts the bucket sizes.
+    # "sqlite" shares buckets between worker processes on one host.
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # or "sqlite"
+    rate_limit_sqlite_path: str = ".cache/rate_limits.db"
+    rate_limit_memory_size: int = 100_000
+    rate_limit_ip_per_minute: float = 600
+    rate_limit_ip_burst: int = 100
+    rate_limit_user_per_minute: float = 600
+    rate_limit_user_burst: int = 100
+    # Per login identifier, and per address on POST /api/users/token.
+    rate_limit_login_per_minute: float = 5
+    rate_limit_login_burst: int = 5
+    rate_limit_login_ip_per_minute: float = 30
+    rate_limit_login_ip_burst: int = 30
+
+    # The memory backend is per process: a write invalidates only its own
+    # worker's entries, and the others serve stale pages for up to the TTL.
+    # Run more than one worker only with "redis".
+    response_cache_enabled: bool = True
+    response_cache_backend: str = "memory"  # or "redis"
+    response_cache_redis_url: str = "redis://localhost:6379/0"
+    response_cache_size: int = 1_024
+    response_cache_ttl_seconds: int = 300
+
+    # Apply pending migrations in the lifespan instead of refusing to start.
+    # Only for single-process setups: concurrent workers would race.
+    migrate_on_startup: bool = False
+
+    sqlalchemy_database_url: str = "sqlite+aiosqlite:///./blog.db"
+    # Optional replica for read-only sessions; defaults to the primary.
+    sqlalchemy_read_database_url: str | None = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 30_000
+
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64_000  # negative means KiB, so ~64 MB
+    sqlite_busy_timeout_ms: int = 5_000
+    sqlite_read_pool_size: int = 5
 
 
 settings = Settings()
@@ -1,12 +1,92 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
 
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./blog.db"
+from app.config import settings
+from app.instrumentation import instrument_engine
+from app.metrics import instrument_pool
+
+SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, *, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    if not read_only:
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size:d}")
+    cursor.execute(f"PRAGMA cache_size={settings.sqlite_cache_size:d}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms:d}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _create_sqlite_engine(url: str, *, read_only: bool) -> AsyncEngine:
+    # SQLite allows a single writer at a time, so every write goes through one
+    # pooled connection instead of racing for the lock and hitting
+    # "database is locked". Reads use a separate pool of query-only
+    # connections, which WAL mode lets run alongside the writer.
+    new_engine = create_async_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=settings.sqlite_read_pool_size if read_only else 1,
+        max_overflow=0,
+    )
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, _connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, read_only=read_only)
+
+    return new_engine
+
+
+def _create_server_engine(url: str) -> AsyncEngine:
+    connect_args = {}
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.db_statement_timeout_ms),
+        }
+    return create_async_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
 
-engine = create_async_engine(
+
+def create_engines(
+    url: str,
+    read_url: str | None = None,
+) -> tuple[AsyncEngine, AsyncEngine]:
+    if make_url(url).get_backend_name() == "sqlite":
+        return (
+            _create_sqlite_engine(url, read_only=False),
+            _create_sqlite_engine(read_url or url, read_only=True),
+        )
+    write_engine = _create_server_engine(url)
+    return write_engine, _create_server_engine(read_url) if read_url else write_engine
+
+
+engine, read_engine = create_engines(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
+    settings.sqlalchemy_read_database_url,
 )
+for _engine in {engine, read_engine}:
+    instrument_engine(_engine.sync_engine)
+instrument_pool(engine.sync_engine, "write")
+if read_engine is not engine:
+    instrument_pool(read_engine.sync_engine, "read")
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -14,11 +94,27 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False,
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
 
 class Base(DeclarativeBase):
     pass
 
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+async def get_db(request: Request):
+    session_factory = (
+        ReadSessionLocal if request.method in READ_METHODS else AsyncSessionLocal
+    )
+    async with session_factory() as session:
+        yield session
+
+
+async def get_read_db():
+    # For lookups that never write, such as authenticating a POST: they must
+    # not check out the single SQLite write connection the handler needs.
+    async with ReadSessionLocal() as session:
         yield session
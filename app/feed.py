@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Literal, NamedTuple, Protocol
+
+from app.config import settings
+from app.metrics import FEED_DROPPED, FEED_SUBSCRIBERS
+from app.schemas import PostEvent, PostResponse
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastBackend(Protocol):
+    # Carries serialized PostEvents to the hub of every worker, this one too.
+    async def publish(self, message: str) -> None: ...
+
+    def listen(self) -> AsyncIterator[str]: ...
+
+    async def close(self) -> None: ...
+
+
+class MemoryBroadcastBackend:
+    # One process: the queue just moves fan-out off the publishing request.
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[str] | None = None
+
+    async def publish(self, message: str) -> None:
+        if self._queue is not None:
+            self._queue.put_nowait(message)
+
+    async def listen(self) -> AsyncIterator[str]:
+        self._queue = asyncio.Queue()
+        while True:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBroadcastBackend:
+    def __init__(self, url: str, channel: str) -> None:
+        import redis.asyncio
+
+        self._client = redis.asyncio.Redis.from_url(url)
+        self.channel = channel
+
+    async def publish(self, message: str) -> None:
+        await self._client.publish(self.channel, message)
+
+    async def listen(self) -> AsyncIterator[str]:
+        async with self._client.pubsub() as pubsub:
+            await pubsub.subscribe(self.channel)
+            async for item in pubsub.listen():
+                if item["type"] == "message":
+                    yield item["data"].decode()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class FeedMessage(NamedTuple):
+    # Encoded once per event, not once per client.
+    text: str
+    sse: bytes
+
+
+# Sent to every client each FEED_KEEPALIVE_SECONDS from one timer, rather
+# than a timeout per waiting client. An SSE comment, so EventSource ignores
+# it; WebSocket clients don't get it.
+KEEPALIVE = FeedMessage("", b": keepalive\n\n")
+
+
+class Subscription:
+    # A client's backlog. Past maxsize the client is closed rather than made
+    # to skip events, so it never shows a feed with holes in it; it
+    # reconnects and reloads the first page instead.
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.closed = False
+        self.overflowed = False
+        self._messages: list[FeedMessage] = []
+        self._waiter: asyncio.Future[None] | None = None
+
+    def deliver(self, message: FeedMessage) -> bool:
+        # False if the client has just been dropped for falling behind.
+        if self.closed:
+            return True
+        if len(self._messages) >= self.maxsize:
+            self.overflowed = True
+            self.close()
+            return False
+        self._messages.append(message)
+        self._wake()
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        self._messages.clear()
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self) -> list[FeedMessage]:
+        # Everything delivered since the last call, so a client that fell
+        # behind catches up in one write; empty once closed.
+        while not self._messages and not self.closed:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        messages, self._messages = self._messages, []
+        return messages
+
+
+class FeedHub:
+    # Routes publish post changes to the backend; a task per worker reads
+    # them back and appends them to each connected client's Subscription.
+    def __init__(self, backend: BroadcastBackend, client_queue_size: int) -> None:
+        self.backend = backend
+        self.client_queue_size = client_queue_size
+        self._subscriptions: set[Subscription] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._run(), name="post-feed"),
+            asyncio.create_task(self._keepalive(), name="post-feed-keepalive"),
+        ]
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for subscription in self._subscriptions:
+            subscription.close()
+        await self.backend.close()
+
+    async def publish(
+        self,
+        event_type: Literal["created", "updated", "deleted"],
+        post: PostResponse,
+    ) -> None:
+        # Outside the lifespan (scripts, benchmarks) nobody is listening. The
+        # post is already committed, so a broken backend only costs the event.
+        if not self._tasks:
+            return
+        message = PostEvent(type=event_type, post=post).model_dump_json()
+        try:
+            await self.backend.publish(message)
+        except Exception:
+            logger.exception(
+                "publishing %s event for post %d failed",
+                event_type,
+                post.id,
+            )
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[Subscription]:
+        subscription = Subscription(self.client_queue_size)
+        self._subscriptions.add(subscription)
+        FEED_SUBSCRIBERS.inc()
+        try:
+            yield subscription
+        finally:
+            self._subscriptions.discard(subscription)
+            FEED_SUBSCRIBERS.dec()
+
+    def fan_out(self, text: str) -> None:
+        self._deliver_all(FeedMessage(text, b"data: " + text.encode() + b"\n\n"))
+
+    def _deliver_all(self, message: FeedMessage) -> None:
+        dropped = [
+            subscription
+            for subscription in self._subscriptions
+            if not subscription.deliver(message)
+        ]
+        for subscription in dropped:
+            self._subscriptions.discard(subscription)
+            FEED_DROPPED.inc()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async for text in self.backend.listen():
+                    self.fan_out(text)
+            except Exception:
+                # Events published while resubscribing are lost; clients
+                # catch up on their next page load.
+                logger.exception("post feed backend failed, resubscribing")
+                await asyncio.sleep(1)
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(settings.feed_keepalive_seconds)
+            self._deliver_all(KEEPALIVE)
+
+
+def create_backend() -> BroadcastBackend:
+    if settings.feed_backend == "redis":
+        return RedisBroadcastBackend(
+            settings.feed_redis_url,
+            settings.feed_redis_channel,
+        )
+    return MemoryBroadcastBackend()
+
+
+feed_hub = FeedHub(create_backend(), settings.feed_client_queue_size)
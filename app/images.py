@@ -0,0 +1,196 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from fastapi import HTTPException, Request, status
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.config import settings
+from app.models import PROFILE_IMAGE_SIZES
+
+PROFILE_PICS_DIR = Path("media/profile_pics")
+
+# Decoding and resizing are CPU-bound and hold the GIL, so they run in
+# separate processes rather than threads. Workers are spawned, not forked,
+# because the web process already has threads (aiosqlite, password hashing).
+image_pool = ProcessPoolExecutor(
+    max_workers=settings.profile_image_workers,
+    mp_context=multiprocessing.get_context("spawn"),
+)
+
+
+class _FilePartWriter:
+    # python-multipart callbacks that collect the bytes of a single file
+    # field as they are parsed, so they can be written out chunk by chunk.
+    def __init__(self, field_name: str, max_bytes: int) -> None:
+        self.field_name = field_name.encode()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.found = False
+        self.pending: list[bytes] = []
+        self._in_target = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def on_part_begin(self) -> None:
+        self._disposition = b""
+        self._in_target = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._in_target = (
+            not self.found
+            and options.get(b"name") == self.field_name
+            and b"filename" in options
+        )
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_target:
+            return
+        self.size += end - start
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Image must be at most {self.max_bytes // (1024 * 1024)} MB",
+            )
+        self.pending.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        if self._in_target:
+            self.found = True
+            self._in_target = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+
+async def receive_upload(
+    request: Request,
+    destination: Path,
+    field_name: str = "file",
+) -> None:
+    # Parses the multipart body as it arrives and appends the file field to
+    # `destination`; at most one network chunk is held in memory.
+    content_type, params = parse_options_header(
+        request.headers.get("content-type", ""),
+    )
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected a multipart/form-data upload",
+        )
+
+    writer = _FilePartWriter(field_name, settings.max_profile_image_bytes)
+    parser = MultipartParser(boundary, callbacks=writer.callbacks())
+    try:
+        with destination.open("wb") as file:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if writer.pending:
+                    data = b"".join(writer.pending)
+                    writer.pending.clear()
+                    await asyncio.to_thread(file.write, data)
+            parser.finalize()
+    except MultipartParseError:
+        destination.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Malformed multipart body",
+        )
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+
+    if not writer.found:
+        destination.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Missing file field '{field_name}'",
+        )
+
+
+def make_profile_variants(source: str, directory: str, stem: str) -> None:
+    # Runs in a worker process. Pillow is imported here so the web process
+    # never has to load it.
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            for size in PROFILE_IMAGE_SIZES:
+                variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+                variant.save(Path(directory) / f"{stem}_{size}.webp", "WEBP", quality=85)
+    except Exception as exc:
+        raise ValueError(f"Invalid image: {exc}") from None
+
+
+async def save_profile_image(request: Request, user_id: int) -> str:
+    PROFILE_PICS_DIR.mkdir(parents=True, exist_ok=True)
+    stem = f"{user_id}_{secrets.token_hex(8)}"
+    # The raw upload stays out of PROFILE_PICS_DIR, which /media serves.
+    fd, upload_name = tempfile.mkstemp(prefix=f"{stem}.", suffix=".upload")
+    os.close(fd)
+    upload_path = Path(upload_name)
+
+    loop = asyncio.get_running_loop()
+    try:
+        await receive_upload(request, upload_path)
+        await loop.run_in_executor(
+            image_pool,
+            make_profile_variants,
+            upload_name,
+            str(PROFILE_PICS_DIR),
+            stem,
+        )
+    except ValueError:
+        remove_profile_image(stem, user_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Uploaded file is not a valid image",
+        )
+    except BaseException:
+        # E.g. a crashed worker (BrokenProcessPool): drop any partial variants.
+        remove_profile_image(stem, user_id)
+        raise
+    finally:
+        upload_path.unlink(missing_ok=True)
+    return stem
+
+
+def remove_profile_image(image_file: str | None, user_id: int) -> None:
+    # Only ever delete files saved for this user; image_file comes from the
+    # users row and must not be able to reach anyone else's.
+    if not image_file or not image_file.startswith(f"{user_id}_"):
+        return
+    if "." in image_file or "/" in image_file:
+        return
+    for size in PROFILE_IMAGE_SIZES:
+        (PROFILE_PICS_DIR / f"{image_file}_{size}.webp").unlink(missing_ok=True)
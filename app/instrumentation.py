@@ -0,0 +1,182 @@
+import functools
+import inspect
+import logging
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(f"{__name__}.slow_queries")
+
+PHASES = ("db", "render", "serialize", "hash")
+
+
+class RequestTimings:
+    __slots__ = ("start", "queries", "endpoint_returned_at", *PHASES)
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.endpoint_returned_at: float | None = None
+        for phase in PHASES:
+            setattr(self, phase, 0.0)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        metrics = [f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"']
+        metrics.extend(
+            f"{phase};dur={getattr(self, phase) * 1000:.1f}" for phase in PHASES[1:]
+        )
+        metrics.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def as_log_fields(self) -> dict[str, float | int]:
+        fields: dict[str, float | int] = {"queries": self.queries}
+        for phase in PHASES:
+            fields[f"{phase}_ms"] = round(getattr(self, phase) * 1000, 2)
+        fields["total_ms"] = round(self.elapsed() * 1000, 2)
+        return fields
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "current_timings",
+    default=None,
+)
+
+
+def add_timing(phase: str, seconds: float) -> None:
+    timings = current_timings.get()
+    if timings is not None:
+        setattr(timings, phase, getattr(timings, phase) + seconds)
+
+
+def db_seconds() -> float:
+    timings = current_timings.get()
+    return timings.db if timings is not None else 0.0
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(phase, time.perf_counter() - start)
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany,
+):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany,
+):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    timings = current_timings.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db += elapsed
+    threshold = settings.slow_query_threshold_ms
+    if threshold is not None and elapsed * 1000 >= threshold:
+        # Parameters are left out on purpose: they can hold password hashes.
+        slow_query_logger.warning(
+            "slow query duration_ms=%.1f statement=%r",
+            elapsed * 1000,
+            statement,
+            extra={"duration_ms": round(elapsed * 1000, 2), "statement": statement},
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _mark_endpoint_return(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def timed_endpoint(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = current_timings.get()
+            if timings is not None:
+                timings.endpoint_returned_at = time.perf_counter()
+
+    return timed_endpoint
+
+
+class InstrumentedRoute(APIRoute):
+    # Attributes the time between the endpoint returning and the handler
+    # producing its Response -- response_model validation and JSON encoding --
+    # to the serialize phase. FastAPI reads the signature through the wrapper.
+    def __init__(self, path: str, endpoint: Callable, **kwargs) -> None:
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _mark_endpoint_return(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def instrumented_handler(request: Request) -> Response:
+            response = await handler(request)
+            timings = current_timings.get()
+            if timings is not None and timings.endpoint_returned_at is not None:
+                timings.serialize += time.perf_counter() - timings.endpoint_returned_at
+                timings.endpoint_returned_at = None
+            return response
+
+        return instrumented_handler
+
+
+class InstrumentationMiddleware:
+    # Server-Timing goes out with the response headers, so for streamed pages
+    # it only covers the work done before the first chunk. The log line is
+    # written once the body has finished and has the full totals.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.instrumentation_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            fields = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                **timings.as_log_fields(),
+            }
+            logger.info(
+                " ".join(f"{key}=%s" for key in fields),
+                *fields.values(),
+                extra=fields,
+            )
@@ -1,3 +1,4 @@
+import time
 from contextlib import asynccontextmanager
 from typing import Annotated
 
@@ -7,75 +8,146 @@ from fastapi.exception_handlers import (
     request_validation_exception_handler,
 )
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from sqlalchemy import select
+from sqlalchemy import Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app import models
-from app.database import Base, engine, get_db
+from app.assets import PrecompressedStaticFiles, build_assets, make_static_url
+from app.auth import hash_pool
+from app.config import settings
+from app.database import ReadSessionLocal, engine, get_db, read_engine
+from app.feed import feed_hub
+from app.images import PROFILE_PICS_DIR, image_pool
+from app.instrumentation import InstrumentationMiddleware, db_seconds
+from app.metrics import MetricsMiddleware, metrics_response
+from app.migrations import check_schema, upgrade
+from app.pagination import PostStream, paginate_posts
+from app.purge import post_purger
+from app.rate_limit import RateLimitMiddleware, rate_limiter
+from app.response_cache import POSTS, USERS, CachedRoute, cached
+from app.serializers import post_row_to_response, select_post_rows
+from app.templating import make_templates, record_render, warm_templates
+from app.write_behind import post_writer
 from routers import posts, users
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        user_columns = {
-            row[1]
-            for row in (
-                await conn.exec_driver_sql("PRAGMA table_info(users)")
-            ).fetchall()
-        }
-        if "password_hash" not in user_columns:
-            await conn.exec_driver_sql(
-                "ALTER TABLE users ADD COLUMN password_hash VARCHAR(200) NOT NULL DEFAULT ''",
-            )
+    if settings.migrate_on_startup:
+        await upgrade(engine)
+    else:
+        await check_schema(engine)
+    warm_templates(templates.env, streaming_templates.env)
+    if settings.post_write_behind:
+        post_writer.start()
+    post_purger.start()
+    feed_hub.start()
     yield
+    await feed_hub.stop()
+    await post_purger.stop()
+    await post_writer.stop()
+    await rate_limiter.close()
+    hash_pool.shutdown()
+    image_pool.shutdown(wait=False, cancel_futures=True)
+    if read_engine is not engine:
+        await read_engine.dispose()
     await engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
+app.router.route_class = CachedRoute
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(InstrumentationMiddleware)
+app.add_middleware(MetricsMiddleware)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+asset_manifest = build_assets()
+app.mount(
+    "/static",
+    PrecompressedStaticFiles(directory="static", manifest=asset_manifest),
+    name="static",
+)
+PROFILE_PICS_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/media", StaticFiles(directory="media"), name="media")
-templates = Jinja2Templates(directory="templates")
+templates = make_templates()
+# Separate async environment for pages rendered with generate_async; the
+# default one must stay sync so TemplateResponse keeps working.
+streaming_templates = make_templates(enable_async=True)
+for _templates in (templates, streaming_templates):
+    _templates.env.globals["profile_image_path"] = models.profile_image_path
+    _templates.env.globals["static_url"] = make_static_url(asset_manifest)
 
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(posts.router, prefix="/api/posts", tags=["posts"])
 
 
+def stream_posts_page(
+    request: Request,
+    name: str,
+    context: dict,
+    stmt: Select,
+) -> StreamingResponse:
+    template = streaming_templates.get_template(name)
+
+    async def render():
+        # The response outlives the request's get_db session, so the stream
+        # opens its own and renders each post as its row is fetched.
+        async with ReadSessionLocal() as session:
+            result = await session.stream(
+                stmt.execution_options(yield_per=settings.feed_stream_batch_size),
+            )
+            posts = PostStream(
+                (post_row_to_response(row) async for row in result),
+                settings.posts_per_page,
+            )
+            # Rows are fetched as the page renders; their DB time is taken
+            # out so render time is Jinja's alone.
+            start = time.perf_counter()
+            db_start = db_seconds()
+            async for chunk in template.generate_async(
+                request=request,
+                posts=posts,
+                **context,
+            ):
+                yield chunk
+            record_render(
+                name,
+                time.perf_counter() - start - (db_seconds() - db_start),
+            )
+
+    return StreamingResponse(render(), media_type="text/html")
+
+
 @app.get("/", include_in_schema=False, name="home")
 @app.get("/posts", include_in_schema=False, name="posts")
-async def home(request: Request, db: Annotated[AsyncSession, Depends(get_db)]):
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .order_by(models.Post.date_posted.desc()),
+@cached(POSTS, USERS)
+async def home(request: Request, cursor: str | None = None):
+    stmt = paginate_posts(
+        select_post_rows(),
+        cursor,
+        settings.posts_per_page,
     )
-    posts_list = result.scalars().all()
-    return templates.TemplateResponse(
+    return stream_posts_page(
         request,
         "home.html",
-        {"posts": posts_list, "title": "Home"},
+        {"title": "Home", "cursor": cursor},
+        stmt,
     )
 
 
 @app.get("/posts/{post_id}", include_in_schema=False, name="post_page")
+@cached(POSTS, USERS)
 async def post_page(
     request: Request,
     post_id: int,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.id == post_id),
-    )
-    post = result.scalars().first()
-    if post:
+    result = await db.execute(select_post_rows().where(models.Post.id == post_id))
+    row = result.first()
+    if row:
+        post = post_row_to_response(row)
         return templates.TemplateResponse(
             request,
             "post.html",
@@ -85,12 +157,19 @@ async def post_page(
 
 
 @app.get("/users/{user_id}/posts", include_in_schema=False, name="user_posts")
+@cached(POSTS, USERS)
 async def user_posts_page(
     request: Request,
     user_id: int,
     db: Annotated[AsyncSession, Depends(get_db)],
+    cursor: str | None = None,
 ):
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    result = await db.execute(
+        select(models.User).where(
+            models.User.id == user_id,
+            models.User.deleted_at.is_(None),
+        ),
+    )
     user = result.scalars().first()
     if not user:
         raise HTTPException(
@@ -98,20 +177,24 @@ async def user_posts_page(
             detail="User not found",
         )
 
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.user_id == user_id)
-        .order_by(models.Post.date_posted.desc()),
+    stmt = paginate_posts(
+        select_post_rows().where(models.Post.user_id == user_id),
+        cursor,
+        settings.posts_per_page,
     )
-    posts_list = result.scalars().all()
-    return templates.TemplateResponse(
+    return stream_posts_page(
         request,
         "user_post.html",
-        {"posts": posts_list, "user": user, "title": f"{user.username}'s Posts"},
+        {"user": user, "title": f"{user.username}'s Posts", "cursor": cursor},
+        stmt,
     )
 
 
+@app.get("/metrics", include_in_schema=False, name="metrics")
+async def metrics():
+    return metrics_response()
+
+
 @app.get("/login", include_in_schema=False, name="login_page")
 async def login_page(request: Request):
     return templates.TemplateResponse(
@@ -0,0 +1,155 @@
+import os
+import time
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# With several workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory
+# before they start. Every process then writes its samples there, and
+# /metrics on any worker reports the sum over all of them. Under gunicorn,
+# also call prometheus_client.multiprocess.mark_process_dead(worker.pid) from
+# a child_exit hook so gauges of dead workers are dropped.
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request, by route name.",
+    ["route", "method", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being served.",
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the SQLAlchemy pool.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond the pool size.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent in Argon2, by operation.",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+TOKEN_VERIFICATION_FAILURES = Counter(
+    "token_verification_failures_total",
+    "Access tokens rejected by verify_access_token.",
+    ["reason"],
+)
+RATE_LIMITED = Counter(
+    "rate_limited_requests_total",
+    "Requests rejected because a rate-limit bucket was empty.",
+    ["rule"],
+)
+FEED_SUBSCRIBERS = Gauge(
+    "post_feed_subscribers",
+    "Clients connected to the live post feed.",
+    multiprocess_mode="livesum",
+)
+FEED_DROPPED = Counter(
+    "post_feed_dropped_clients_total",
+    "Feed clients disconnected for falling too far behind.",
+)
+TEMPLATE_RENDER_DURATION = Histogram(
+    "template_render_duration_seconds",
+    "Time Jinja spends rendering a page, by template.",
+    ["template"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "In-process cache lookups.",
+    ["cache", "result"],
+)
+
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    overflow = POOL_OVERFLOW.labels(name)
+
+    # checkin fires before the connection is back in the pool, so
+    # pool.checkedout() would still count it there.
+    def on_checkout(*args) -> None:
+        checked_out.inc()
+        overflow.set(max(pool.overflow(), 0))
+
+    def on_checkin(*args) -> None:
+        checked_out.dec()
+        overflow.set(max(pool.overflow(), 0))
+
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def route_name(scope: Scope) -> str:
+    # Label by route name rather than path so path parameters don't multiply
+    # the series. Mounts aren't recorded as the scope's route, but they do
+    # set root_path to their prefix, e.g. "/static".
+    route = scope.get("route")
+    if route is not None:
+        return route.name
+    if "app_root_path" in scope:
+        return scope["root_path"].rstrip("/").rsplit("/", 1)[-1]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_DURATION.labels(
+                route_name(scope),
+                scope["method"],
+                status_code,
+            ).observe(time.perf_counter() - start)
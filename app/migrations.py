@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from typing import NamedTuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    func,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.database import engine
+from app.search import create_search_index
+
+# Applied once per deploy with `python -m app.migrations upgrade`; workers only
+# compare the recorded version against LATEST_VERSION at startup. Each
+# migration runs in its own transaction and records its version on success.
+# Steps that predate versioning check before altering, because databases
+# created by the old startup code may already have them.
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str):
+    def register(apply):
+        MIGRATIONS.append(Migration(version, description, apply))
+        return apply
+
+    return register
+
+
+async def _column_names(conn: AsyncConnection, table: str) -> set[str]:
+    columns = await conn.run_sync(
+        lambda sync_conn: inspect(sync_conn).get_columns(table),
+    )
+    return {column["name"] for column in columns}
+
+
+@migration(1, "create users and posts")
+async def _create_base_tables(conn: AsyncConnection) -> None:
+    # The original schema, spelled out rather than taken from app.models so
+    # later model changes don't rewrite history.
+    metadata = MetaData()
+    Table(
+        "users",
+        metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("username", String(50), unique=True, nullable=False),
+        Column("email", String(120), unique=True, nullable=False),
+        Column("password_hash", String(200), nullable=False),
+        Column("image_file", String(200), nullable=True),
+    )
+    Table(
+        "posts",
+        metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("title", String(100), nullable=False),
+        Column("content", Text, nullable=False),
+        Column("user_id", ForeignKey("users.id"), nullable=False, index=True),
+        Column("date_posted", DateTime(timezone=True), nullable=False),
+    )
+    await conn.run_sync(metadata.create_all)
+
+
+@migration(2, "add users.password_hash")
+async def _add_password_hash(conn: AsyncConnection) -> None:
+    if "password_hash" not in await _column_names(conn, "users"):
+        await conn.exec_driver_sql(
+            "ALTER TABLE users ADD COLUMN password_hash VARCHAR(200) NOT NULL DEFAULT ''",
+        )
+
+
+@migration(3, "add posts.updated_at")
+async def _add_post_updated_at(conn: AsyncConnection) -> None:
+    if "updated_at" not in await _column_names(conn, "posts"):
+        column_type = DateTime(timezone=True).compile(dialect=conn.dialect)
+        await conn.exec_driver_sql(
+            f"ALTER TABLE posts ADD COLUMN updated_at {column_type}",
+        )
+
+
+@migration(4, "index posts for keyset pagination")
+async def _add_post_keyset_indexes(conn: AsyncConnection) -> None:
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_posts_date_posted_id "
+        "ON posts (date_posted, id)",
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_posts_user_id_date_posted_id "
+        "ON posts (user_id, date_posted, id)",
+    )
+
+
+@migration(5, "create post search index")
+async def _create_search_index(conn: AsyncConnection) -> None:
+    await create_search_index(conn)
+
+
+@migration(6, "unique index on lower(users.email)")
+async def _add_email_lower_index(conn: AsyncConnection) -> None:
+    # An expression index needs no backfill, but it can't be built while two
+    # accounts differ only in the case of their email.
+    lowered = func.lower(text("email"))
+    duplicates = (
+        await conn.execute(
+            select(lowered)
+            .select_from(text("users"))
+            .group_by(lowered)
+            .having(func.count() > 1),
+        )
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            "Cannot add a case-insensitive unique index on users.email; "
+            f"resolve these duplicates first: {', '.join(duplicates)}",
+        )
+    await conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email_lower "
+        "ON users (lower(email))",
+    )
+
+
+@migration(7, "add users.token_version")
+async def _add_token_version(conn: AsyncConnection) -> None:
+    if "token_version" not in await _column_names(conn, "users"):
+        await conn.exec_driver_sql(
+            "ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0",
+        )
+
+
+@migration(8, "add users.post_count and users.last_posted_at")
+async def _add_user_post_stats(conn: AsyncConnection) -> None:
+    columns = await _column_names(conn, "users")
+    if "post_count" not in columns:
+        await conn.exec_driver_sql(
+            "ALTER TABLE users ADD COLUMN post_count INTEGER NOT NULL DEFAULT 0",
+        )
+    if "last_posted_at" not in columns:
+        column_type = DateTime(timezone=True).compile(dialect=conn.dialect)
+        await conn.exec_driver_sql(
+            f"ALTER TABLE users ADD COLUMN last_posted_at {column_type}",
+        )
+    await conn.exec_driver_sql(
+        "UPDATE users SET "
+        "post_count = (SELECT count(*) FROM posts WHERE posts.user_id = users.id), "
+        "last_posted_at = "
+        "(SELECT max(date_posted) FROM posts WHERE posts.user_id = users.id)",
+    )
+
+
+@migration(9, "add users.deleted_at")
+async def _add_user_deleted_at(conn: AsyncConnection) -> None:
+    if "deleted_at" not in await _column_names(conn, "users"):
+        column_type = DateTime(timezone=True).compile(dialect=conn.dialect)
+        await conn.exec_driver_sql(
+            f"ALTER TABLE users ADD COLUMN deleted_at {column_type}",
+        )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_users_deleted_at ON users (deleted_at) "
+        "WHERE deleted_at IS NOT NULL",
+    )
+
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    has_table = await conn.run_sync(
+        lambda sync_conn: inspect(sync_conn).has_table(schema_version.name),
+    )
+    if not has_table:
+        return 0
+    version = await conn.scalar(select(func.max(schema_version.c.version)))
+    return version or 0
+
+
+async def upgrade(db_engine: AsyncEngine) -> list[Migration]:
+    async with db_engine.begin() as conn:
+        await conn.run_sync(version_metadata.create_all)
+        version = await current_version(conn)
+    applied = []
+    for step in MIGRATIONS:
+        if step.version <= version:
+            continue
+        async with db_engine.begin() as conn:
+            await step.apply(conn)
+            await conn.execute(
+                schema_version.insert().values(
+                    version=step.version,
+                    description=step.description,
+                    applied_at=datetime.now(UTC),
+                ),
+            )
+        applied.append(step)
+    return applied
+
+
+class SchemaOutOfDateError(RuntimeError):
+    pass
+
+
+async def check_schema(db_engine: AsyncEngine) -> None:
+    async with db_engine.connect() as conn:
+        version = await current_version(conn)
+    if version < LATEST_VERSION:
+        raise SchemaOutOfDateError(
+            f"Database schema is at version {version}, the app needs "
+            f"{LATEST_VERSION}. Run `python -m app.migrations upgrade` first.",
+        )
+
+
+async def main(command: str) -> None:
+    try:
+        if command == "upgrade":
+            for step in await upgrade(engine):
+                print(f"applied {step.version}: {step.description}")
+            print(f"schema is at version {LATEST_VERSION}")
+        elif command == "current":
+            async with engine.connect() as conn:
+                print(await current_version(conn))
+        else:
+            for step in MIGRATIONS:
+                print(f"{step.version}: {step.description}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage database migrations.")
+    parser.add_argument("command", choices=["upgrade", "current", "history"])
+    args = parser.parse_args()
+    asyncio.run(main(args.command))
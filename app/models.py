@@ -2,12 +2,24 @@ from __future__ import annotations
 
 from datetime import UTC, datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
 
 
+PROFILE_IMAGE_SIZES = (64, 128, 256)
+
+
+def profile_image_path(image_file: str | None, size: int = 256) -> str:
+    if not image_file:
+        return "/static/profile_pics/default.jpg"
+    if "." in image_file:
+        # Legacy value that names a single file rather than a variant stem.
+        return f"/media/profile_pics/{image_file}"
+    return f"/media/profile_pics/{image_file}_{size}.webp"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -15,6 +27,29 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
     email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
     password_hash :  Mapped[str] = mapped_column(String(200),unique=False, nullable=False)
+    # Bumped to revoke every token issued to the user so far.
+    token_version: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+    # Maintained by the post write paths; see app.user_stats.
+    post_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+    last_posted_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+    # Set by delete_user; the row and its posts are removed by app.purge.
+    deleted_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
     
     image_file: Mapped[str | None] = mapped_column(
         String(200),
@@ -32,13 +67,16 @@ class User(Base):
 
     @property
     def image_path(self) -> str:
-        if self.image_file:
-            return f"/media/profile_pics/{self.image_file}"
-        return "/static/profile_pics/default.jpg"
+        return profile_image_path(self.image_file)
 
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Cover the (date_posted, id) keyset used for cursor pagination.
+        Index("ix_posts_date_posted_id", "date_posted", "id"),
+        Index("ix_posts_user_id_date_posted_id", "user_id", "date_posted", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -52,5 +90,23 @@ class Post(Base):
         DateTime(timezone=True),
         default=lambda: datetime.now(UTC),
     )
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+    )
+
+    author: Mapped[User] = relationship(back_populates="posts")
+
 
-    author: Mapped[User] = relationship(back_populates="posts")
\ No newline at end of file
+# Emails are matched case-insensitively, so uniqueness and lookups both go
+# through lower(email) rather than the column itself.
+Index("ix_users_email_lower", func.lower(User.email), unique=True)
+# Only accounts still being purged have deleted_at set, so this stays tiny.
+Index(
+    "ix_users_deleted_at",
+    User.deleted_at,
+    sqlite_where=User.deleted_at.is_not(None),
+    postgresql_where=User.deleted_at.is_not(None),
+)
@@ -0,0 +1,87 @@
+import base64
+import binascii
+import json
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+
+from app import models
+
+
+def invalid_cursor_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor",
+    )
+
+
+def encode_keyset(values: list) -> str:
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_keyset(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise invalid_cursor_error()
+    if not isinstance(values, list):
+        raise invalid_cursor_error()
+    return values
+
+
+def encode_cursor(post: models.Post) -> str:
+    return encode_keyset([post.date_posted.isoformat(), post.id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        date_posted, post_id = decode_keyset(cursor)
+        return datetime.fromisoformat(date_posted), int(post_id)
+    except (TypeError, ValueError):
+        raise invalid_cursor_error()
+
+
+def paginate_posts(stmt: Select, cursor: str | None, limit: int) -> Select:
+    # Keyset pagination on (date_posted, id) so every page is a single index
+    # range scan, no matter how deep into the feed it is.
+    if cursor is not None:
+        date_posted, post_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(models.Post.date_posted, models.Post.id)
+            < tuple_(date_posted, post_id),
+        )
+    return stmt.order_by(
+        models.Post.date_posted.desc(),
+        models.Post.id.desc(),
+    ).limit(limit + 1)
+
+
+def build_page(posts: Sequence[models.Post], limit: int) -> dict:
+    # paginate_posts fetches one extra row to tell whether another page exists.
+    items = list(posts[:limit])
+    next_cursor = encode_cursor(items[-1]) if len(posts) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+class PostStream:
+    # Async iterable handed to streamed templates: yields up to `limit` posts as
+    # they come off the DB cursor and sets `next_cursor` once the page is done.
+    def __init__(self, posts: AsyncIterator[models.Post], limit: int) -> None:
+        self._posts = posts
+        self._limit = limit
+        self.next_cursor: str | None = None
+
+    async def __aiter__(self) -> AsyncIterator[models.Post]:
+        last_post = None
+        count = 0
+        async for post in self._posts:
+            if count == self._limit:
+                self.next_cursor = encode_cursor(last_post)
+                break
+            yield post
+            last_post = post
+            count += 1
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from datetime import UTC, datetime
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.feed import feed_hub
+from app.schemas import PostResponse, UserPublic
+
+logger = logging.getLogger(__name__)
+
+
+class PostPurger:
+    # Finishes account deletions in the background. delete_user only marks
+    # the user deleted, which hides the account and its posts at once; this
+    # task then deletes the posts batch_size at a time, each batch in its own
+    # short transaction so the SQLite write lock is never held for long, and
+    # finally, once grace_seconds have passed since the deletion, the user
+    # row. Each purged post goes out on the live feed as "deleted". Marked
+    # users left over from a previous run are picked up again on start.
+    def __init__(
+        self,
+        batch_size: int,
+        pause_ms: float,
+        grace_seconds: float,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    ) -> None:
+        self.batch_size = batch_size
+        self.pause = pause_ms / 1000
+        self.grace_seconds = grace_seconds
+        self.session_factory = session_factory
+        self._queue: asyncio.Queue[int | None] | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="post-purger")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # Cancelling mid-batch would cut a session off inside its transaction;
+        # finish the current batch instead and leave the rest for next start.
+        self._stopping.set()
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    def schedule(self, user_id: int) -> None:
+        if self._queue is not None:
+            self._queue.put_nowait(user_id)
+
+    async def _run(self) -> None:
+        async with self.session_factory() as session:
+            pending = await session.scalars(
+                select(models.User.id).where(models.User.deleted_at.is_not(None)),
+            )
+            for user_id in pending:
+                self._queue.put_nowait(user_id)
+        while not self._stopping.is_set():
+            user_id = await self._queue.get()
+            if user_id is None:
+                break
+            try:
+                deleted = await self.purge(user_id)
+            except Exception:
+                logger.exception("purging posts of deleted user %d failed", user_id)
+            else:
+                logger.info("purged user %d and %d posts", user_id, deleted)
+            finally:
+                self._queue.task_done()
+
+    async def purge(self, user_id: int) -> int:
+        async with self.session_factory() as session:
+            user = await session.get(models.User, user_id)
+        if user is None or user.deleted_at is None:
+            return 0
+        deleted_at = user.deleted_at
+        # Every purged post has the same author, so build it once.
+        author = UserPublic.model_construct(
+            id=user.id,
+            username=user.username,
+            image_file=user.image_file,
+            image_path=models.profile_image_path(user.image_file),
+        )
+        if deleted_at.tzinfo is None:  # SQLite drops the offset
+            deleted_at = deleted_at.replace(tzinfo=UTC)
+
+        deleted = 0
+        batch = (
+            select(models.Post.id)
+            .where(models.Post.user_id == user_id)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        while True:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    delete(models.Post)
+                    .where(models.Post.id.in_(batch))
+                    .returning(
+                        models.Post.title,
+                        models.Post.content,
+                        models.Post.id,
+                        models.Post.date_posted,
+                        models.Post.updated_at,
+                    )
+                    .execution_options(synchronize_session=False),
+                )
+                purged = result.all()
+                deleted += len(purged)
+                done = len(purged) < self.batch_size
+                wait = self.grace_seconds - (
+                    datetime.now(UTC) - deleted_at
+                ).total_seconds()
+                if done and wait <= 0:
+                    # A post can still have landed since the batch above;
+                    # then the user stays and the loop deletes it first.
+                    result = await session.execute(
+                        delete(models.User)
+                        .where(
+                            models.User.id == user_id,
+                            ~exists().where(models.Post.user_id == user_id),
+                        )
+                        .execution_options(synchronize_session=False),
+                    )
+                    done = result.rowcount == 1
+                await session.commit()
+            for row in purged:
+                await feed_hub.publish(
+                    "deleted",
+                    PostResponse.model_construct(
+                        **row._asdict(),
+                        user_id=user_id,
+                        author=author,
+                    ),
+                )
+            if done and wait <= 0:
+                return deleted
+            if self._stopping.is_set():
+                return deleted
+            if done:
+                # Only the user row is left, but requests authenticated with
+                # a cached token version may still add posts until then.
+                pause = wait
+            else:
+                # sleep(0) would only let this process's writers in; SQLite's
+                # busy handler in other processes polls, so give it time.
+                pause = self.pause
+            try:
+                await asyncio.wait_for(self._stopping.wait(), pause)
+            except TimeoutError:
+                pass
+
+
+post_purger = PostPurger(
+    batch_size=settings.post_purge_batch_size,
+    pause_ms=settings.post_purge_pause_ms,
+    grace_seconds=settings.post_purge_grace_seconds,
+)
@@ -0,0 +1,246 @@
+import math
+import time
+from pathlib import Path
+from typing import Annotated, NamedTuple, Protocol
+
+import aiosqlite
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from fastapi.security import OAuth2PasswordRequestForm
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.auth import verify_access_token
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import RATE_LIMITED
+
+
+class Rule(NamedTuple):
+    name: str
+    capacity: int
+    per_second: float
+
+
+def _rule(name: str, per_minute: float, burst: int) -> Rule:
+    return Rule(name, burst, per_minute / 60)
+
+
+IP = _rule("ip", settings.rate_limit_ip_per_minute, settings.rate_limit_ip_burst)
+USER = _rule(
+    "user",
+    settings.rate_limit_user_per_minute,
+    settings.rate_limit_user_burst,
+)
+LOGIN = _rule(
+    "login",
+    settings.rate_limit_login_per_minute,
+    settings.rate_limit_login_burst,
+)
+LOGIN_IP = _rule(
+    "login_ip",
+    settings.rate_limit_login_ip_per_minute,
+    settings.rate_limit_login_ip_burst,
+)
+
+
+class RateLimitBackend(Protocol):
+    # Takes one token from the bucket at key and returns 0, or returns how
+    # many seconds until a token is available if the bucket is empty.
+    async def take(self, key: str, rule: Rule) -> float: ...
+
+
+class MemoryRateLimitBackend:
+    # Per-process buckets. An entry expires once its bucket would be full
+    # again, so a missing entry and a full bucket are the same thing and the
+    # LRU only has to hold clients that are actually being throttled.
+    def __init__(self, maxsize: int) -> None:
+        self._buckets = TTLCache(maxsize=maxsize)
+
+    async def take(self, key: str, rule: Rule) -> float:
+        now = time.time()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = rule.capacity
+        else:
+            tokens, updated_at = bucket
+            tokens = min(rule.capacity, tokens + (now - updated_at) * rule.per_second)
+        if tokens < 1:
+            return (1 - tokens) / rule.per_second
+        tokens -= 1
+        self._buckets.set(
+            key,
+            (tokens, now),
+            expires_at=now + (rule.capacity - tokens) / rule.per_second,
+        )
+        return 0.0
+
+
+class SQLiteRateLimitBackend:
+    # Buckets shared by every worker on the host through one SQLite file.
+    # Each take is a single UPSERT: the DO UPDATE only applies when the
+    # refilled bucket holds a token, and RETURNING yields no row otherwise.
+    TAKE_SQL = """
+        INSERT INTO rate_limit_buckets (key, tokens, updated_at, full_at)
+        VALUES (:key, :capacity - 1, :now, :now + 1 / :rate)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:capacity, tokens + (:now - updated_at) * :rate) - 1,
+            updated_at = :now,
+            full_at = :now + (:capacity + 1
+                - min(:capacity, tokens + (:now - updated_at) * :rate)) / :rate
+        WHERE min(:capacity, tokens + (:now - updated_at) * :rate) >= 1
+        RETURNING tokens
+    """
+    PRUNE_EVERY = 1_000
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn: aiosqlite.Connection | None = None
+        self._takes = 0
+
+    async def _connect(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = await aiosqlite.connect(self.path, isolation_level=None)
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            await conn.execute(
+                f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms:d}",
+            )
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated_at REAL NOT NULL, full_at REAL NOT NULL)",
+            )
+            self._conn = conn
+        return self._conn
+
+    async def take(self, key: str, rule: Rule) -> float:
+        conn = await self._connect()
+        now = time.time()
+        params = {
+            "key": key,
+            "capacity": rule.capacity,
+            "rate": rule.per_second,
+            "now": now,
+        }
+        async with conn.execute(self.TAKE_SQL, params) as cursor:
+            taken = await cursor.fetchone()
+        self._takes += 1
+        if self._takes % self.PRUNE_EVERY == 0:
+            await conn.execute(
+                "DELETE FROM rate_limit_buckets WHERE full_at < ?",
+                (now,),
+            )
+        if taken is not None:
+            return 0.0
+        async with conn.execute(
+            "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?",
+            (key,),
+        ) as cursor:
+            tokens, updated_at = await cursor.fetchone()
+        tokens = min(rule.capacity, tokens + (now - updated_at) * rule.per_second)
+        return max(1 - tokens, 0) / rule.per_second
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend) -> None:
+        self.backend = backend
+
+    async def check(self, *limits: tuple[Rule, str]) -> float:
+        # Every bucket is charged so each limit sees all traffic; returns the
+        # longest wait among those that are empty.
+        retry_after = 0.0
+        for rule, identity in limits:
+            wait = await self.backend.take(f"{rule.name}:{identity}", rule)
+            if wait:
+                RATE_LIMITED.labels(rule.name).inc()
+                retry_after = max(retry_after, wait)
+        return retry_after
+
+    async def close(self) -> None:
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            await close()
+
+
+def create_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "sqlite":
+        return SQLiteRateLimitBackend(settings.rate_limit_sqlite_path)
+    return MemoryRateLimitBackend(settings.rate_limit_memory_size)
+
+
+rate_limiter = RateLimiter(create_backend())
+
+
+def client_ip(scope: Scope) -> str:
+    # The socket peer; behind a proxy, run uvicorn with --proxy-headers and
+    # --forwarded-allow-ips so this is the real client.
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def retry_after_header(retry_after: float) -> dict[str, str]:
+    return {"Retry-After": str(math.ceil(retry_after))}
+
+
+class RateLimitMiddleware:
+    # Per-IP and, for bearer tokens, per-user limits on the API. Runs before
+    # routing, so a throttled request never reaches a session or a hash.
+    # The user comes from the token's signature alone (cached), not the DB.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not settings.rate_limit_enabled
+            or not scope["path"].startswith("/api")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        limits = [(IP, client_ip(scope))]
+        authorization = Headers(scope=scope).get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            claims = verify_access_token(token, count_failures=False)
+            if claims is not None:
+                limits.append((USER, str(claims.user_id)))
+
+        retry_after = await rate_limiter.check(*limits)
+        if retry_after:
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=retry_after_header(retry_after),
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+async def limit_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+) -> None:
+    # Credential stuffing spreads guesses over many accounts from a few
+    # addresses, or over many addresses against one account; bound both
+    # before the user lookup and the Argon2 verify.
+    if not settings.rate_limit_enabled:
+        return
+    retry_after = await rate_limiter.check(
+        (LOGIN_IP, client_ip(request.scope)),
+        (LOGIN, form_data.username.strip().lower()),
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers=retry_after_header(retry_after),
+        )
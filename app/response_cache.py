@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Callable
+from typing import Protocol
+
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from app.cache import TTLCache
+from app.config import settings
+from app.instrumentation import InstrumentedRoute
+from app.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Tags name the data a cached response was built from. Writes bump the tag's
+# generation, which changes the key of every entry that depends on it, so a
+# whole family of responses is invalidated in O(1) on any backend.
+POSTS = "posts"
+USERS = "users"
+
+
+class CacheBackend(Protocol):
+    # The subset of Redis commands the response cache needs.
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ex: int | None = None) -> None: ...
+
+    async def incr(self, key: str) -> int: ...
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int) -> None:
+        self._entries = TTLCache(maxsize=maxsize)
+        # Generation counters live outside the LRU so they are never evicted.
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ex: int | None = None) -> None:
+        expires_at = None
+        if ex is not None:
+            expires_at = time.time() + ex
+        self._entries.set(key, value, expires_at=expires_at)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisCacheBackend:
+    def __init__(self, url: str) -> None:
+        import redis.asyncio
+
+        self._client = redis.asyncio.Redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ex: int | None = None) -> None:
+        await self._client.set(key, value, ex=ex)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: int | None = None) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def _generation(self, tag: str) -> bytes:
+        return await self.backend.get(f"gen:{tag}") or b"0"
+
+    async def key_for(self, request: Request, tags: tuple[str, ...]) -> str:
+        generations = [await self._generation(tag) for tag in tags]
+        query = "&".join(sorted(request.url.query.split("&")))
+        # Cached pages hold absolute url_for() URLs, so a page rendered for
+        # one scheme or host must not be served to another.
+        return ":".join(
+            [
+                "response",
+                str(request.base_url),
+                request.url.path,
+                query,
+                *(generation.decode() for generation in generations),
+            ],
+        )
+
+    async def get(self, key: str) -> tuple[dict, bytes] | None:
+        raw = await self.backend.get(key)
+        if raw is None:
+            self.misses += 1
+            CACHE_LOOKUPS.labels("response", "miss").inc()
+            return None
+        self.hits += 1
+        CACHE_LOOKUPS.labels("response", "hit").inc()
+        meta, _, body = raw.partition(b"\n")
+        return json.loads(meta), body
+
+    async def set(self, key: str, meta: dict, body: bytes) -> None:
+        await self.backend.set(key, json.dumps(meta).encode() + b"\n" + body, ex=self.ttl)
+
+    async def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            await self.backend.incr(f"gen:{tag}")
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_backend() -> CacheBackend:
+    if settings.response_cache_backend == "redis":
+        return RedisCacheBackend(settings.response_cache_redis_url)
+    if int(os.environ.get("WEB_CONCURRENCY", "1")) > 1:
+        logger.warning(
+            "RESPONSE_CACHE_BACKEND=memory with several workers: a write only "
+            "invalidates the cache of the worker that handled it; use redis",
+        )
+    return MemoryCacheBackend(settings.response_cache_size)
+
+
+response_cache = ResponseCache(
+    create_backend(),
+    ttl=settings.response_cache_ttl_seconds,
+)
+
+
+def cached(*tags: str) -> Callable:
+    # Marks an endpoint as cacheable; CachedRoute does the actual work.
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.cache_tags = tags
+        return endpoint
+
+    return decorator
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (value.strip().removeprefix("W/") for value in if_none_match.split(","))
+    return etag in candidates
+
+
+def cached_response(meta: dict, body: bytes, request: Request) -> Response:
+    headers = {"ETag": meta["etag"], "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), meta["etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type=meta["media_type"], headers=headers)
+
+
+class CachedRoute(InstrumentedRoute):
+    # Serves GET endpoints marked with @cached from the response cache and
+    # answers matching If-None-Match requests with 304.
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        tags = getattr(self.endpoint, "cache_tags", None)
+        if tags is None:
+            return handler
+
+        async def cached_handler(request: Request) -> Response:
+            if not settings.response_cache_enabled:
+                return await handler(request)
+
+            key = await response_cache.key_for(request, tags)
+            entry = await response_cache.get(key)
+            if entry is not None:
+                return cached_response(*entry, request)
+
+            response = await handler(request)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            media_type = response.headers.get("content-type")
+
+            if isinstance(response, StreamingResponse):
+                # Keep streaming the miss; the entry is stored once the last
+                # chunk has gone out, so only later requests get an ETag.
+                body_iterator = response.body_iterator
+                chunks = []
+
+                async def tee():
+                    async for chunk in body_iterator:
+                        if isinstance(chunk, str):
+                            chunk = chunk.encode(response.charset)
+                        chunks.append(chunk)
+                        yield chunk
+                    body = b"".join(chunks)
+                    meta = {"etag": make_etag(body), "media_type": media_type}
+                    await response_cache.set(key, meta, body)
+
+                response.body_iterator = tee()
+                return response
+
+            meta = {"etag": make_etag(response.body), "media_type": media_type}
+            await response_cache.set(key, meta, response.body)
+            return cached_response(meta, response.body, request)
+
+        return cached_handler
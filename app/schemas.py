@@ -1,6 +1,7 @@
-from datetime import datetime
+from datetime import UTC, datetime
+from typing import Literal
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 
 
 class UserBase(BaseModel):
@@ -21,6 +22,11 @@ class UserPublic(BaseModel):
     image_path: str
 
 
+class UserProfile(UserPublic):
+    post_count: int
+    last_posted_at: datetime | None
+
+
 class UserPrivate(UserPublic):
     email: EmailStr
 
@@ -28,14 +34,18 @@ class UserPrivate(UserPublic):
 class UserUpdate(BaseModel):
     username: str | None = Field(default=None, min_length=1, max_length=50)
     email: EmailStr | None = None
-    image_file: str | None = Field(default=None, max_length=200)
 
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str
 
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+
 class PostBase(BaseModel):
     title: str = Field(min_length=1, max_length=100)
     content: str = Field(min_length=1)
@@ -45,6 +55,19 @@ class PostCreate(PostBase):
     pass
 
 
+class PostImport(PostCreate):
+    date_posted: datetime | None = None
+
+    @field_validator("date_posted")
+    @classmethod
+    def _to_utc(cls, value: datetime | None) -> datetime | None:
+        # SQLite drops the offset on write, so +05:00 would be read back as
+        # UTC and sort out of order; naive times are taken to be UTC already.
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(UTC)
+
+
 class PostUpdate(BaseModel):
     title: str | None = Field(default=None, min_length=1, max_length=100)
     content: str | None = Field(default=None, min_length=1)
@@ -56,4 +79,33 @@ class PostResponse(PostBase):
     id: int
     user_id: int
     date_posted: datetime
+    updated_at: datetime | None = None
     author: UserPublic
+
+
+class PostPage(BaseModel):
+    items: list[PostResponse]
+    next_cursor: str | None
+
+
+class PostEvent(BaseModel):
+    # One message on /api/posts/stream; a deleted post is sent as it was.
+    type: Literal["created", "updated", "deleted"]
+    post: PostResponse
+
+
+class PostSearchHit(PostResponse):
+    # HTML-escaped text with matches wrapped in <mark>.
+    title_highlight: str
+    content_snippet: str
+
+
+class PostSearchPage(BaseModel):
+    items: list[PostSearchHit]
+    next_cursor: str | None
+
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    elapsed_seconds: float
+    rows_per_second: float
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import html
+
+from sqlalchemy import (
+    Float,
+    Integer,
+    Row,
+    Select,
+    column,
+    func,
+    literal_column,
+    table,
+    tuple_,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app import models
+from app.database import engine
+from app.pagination import decode_keyset, encode_keyset, invalid_cursor_error
+from app.schemas import PostSearchHit
+from app.serializers import post_row_to_response, select_post_rows
+
+# External-content FTS5 index over posts(title, content). The triggers keep
+# it in sync with every write path, including bulk inserts and cascades.
+SEARCH_INDEX_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, content,
+        content='posts', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+)
+
+REBUILD_SQL = "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"
+
+# Control characters mark matches so the text can be HTML-escaped before
+# they are turned into <mark> tags.
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+posts_fts = table(
+    "posts_fts",
+    column("rowid", Integer),
+    column("rank", Float),
+)
+_fts = literal_column("posts_fts")
+
+
+def search_supported(dialect_name: str) -> bool:
+    return dialect_name == "sqlite"
+
+
+async def create_search_index(conn: AsyncConnection) -> None:
+    if not search_supported(conn.dialect.name):
+        return
+    exists = (
+        await conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'",
+        )
+    ).first()
+    for statement in SEARCH_INDEX_DDL:
+        await conn.exec_driver_sql(statement)
+    if not exists:
+        # Backfill posts written before the index existed.
+        await conn.exec_driver_sql(REBUILD_SQL)
+
+
+def fts_query(q: str) -> str:
+    # Quote every term so user input can't hit FTS5 query syntax errors;
+    # the terms are ANDed together.
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+def select_search_rows(q: str, cursor: str | None, limit: int) -> Select:
+    stmt = (
+        select_post_rows()
+        .join(posts_fts, posts_fts.c.rowid == models.Post.id)
+        .add_columns(
+            posts_fts.c.rank.label("rank"),
+            func.highlight(_fts, 0, MATCH_START, MATCH_END).label("title_highlight"),
+            func.snippet(_fts, 1, MATCH_START, MATCH_END, "…", 32).label(
+                "content_snippet",
+            ),
+        )
+        .where(_fts.op("MATCH")(fts_query(q)))
+    )
+    if cursor is not None:
+        rank, post_id = decode_search_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(posts_fts.c.rank, models.Post.id) > tuple_(rank, post_id),
+        )
+    # FTS5 rank is bm25(), where lower means more relevant.
+    return stmt.order_by(posts_fts.c.rank, models.Post.id).limit(limit + 1)
+
+
+def encode_search_cursor(row: Row) -> str:
+    return encode_keyset([row.rank, row.id])
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rank, post_id = decode_keyset(cursor)
+        return float(rank), int(post_id)
+    except (TypeError, ValueError):
+        raise invalid_cursor_error()
+
+
+def render_highlight(text: str) -> str:
+    return (
+        html.escape(text)
+        .replace(MATCH_START, "<mark>")
+        .replace(MATCH_END, "</mark>")
+    )
+
+
+def search_row_to_hit(row: Row) -> PostSearchHit:
+    post = post_row_to_response(row)
+    return PostSearchHit.model_construct(
+        **dict(post),
+        title_highlight=render_highlight(row.title_highlight),
+        content_snippet=render_highlight(row.content_snippet),
+    )
+
+
+def build_search_page(rows: list[Row], limit: int) -> dict:
+    items = [search_row_to_hit(row) for row in rows[:limit]]
+    next_cursor = encode_search_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def rebuild_search_index() -> None:
+    async with engine.begin() as conn:
+        await create_search_index(conn)
+        await conn.exec_driver_sql(REBUILD_SQL)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the post search index.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    asyncio.run(rebuild_search_index())
@@ -0,0 +1,104 @@
+from collections.abc import AsyncIterator, Sequence
+
+from pydantic_core import to_json
+from sqlalchemy import Row, Select, select
+
+from app import models
+from app.instrumentation import timed
+from app.pagination import encode_cursor
+from app.schemas import PostResponse, UserPublic
+
+# Exactly the columns a PostResponse needs, fetched in one joined query.
+POST_ROW_COLUMNS = (
+    models.Post.title,
+    models.Post.content,
+    models.Post.id,
+    models.Post.user_id,
+    models.Post.date_posted,
+    models.Post.updated_at,
+    models.User.username.label("author_username"),
+    models.User.image_file.label("author_image_file"),
+)
+
+
+def select_post_rows() -> Select:
+    # Posts of accounts awaiting purge are hidden along with the account.
+    return (
+        select(*POST_ROW_COLUMNS)
+        .join(models.Post.author)
+        .where(models.User.deleted_at.is_(None))
+    )
+
+
+def post_row_to_dict(row: Row) -> dict:
+    # Key order mirrors PostResponse / UserPublic so the JSON is byte-for-byte
+    # what the response_model path produces.
+    return {
+        "title": row.title,
+        "content": row.content,
+        "id": row.id,
+        "user_id": row.user_id,
+        "date_posted": row.date_posted,
+        "updated_at": row.updated_at,
+        "author": {
+            "id": row.user_id,
+            "username": row.author_username,
+            "image_file": row.author_image_file,
+            "image_path": models.profile_image_path(row.author_image_file),
+        },
+    }
+
+
+def post_row_to_response(row: Row) -> PostResponse:
+    # The row already holds validated DB values, so skip validation and the
+    # ORM identity map entirely; templates and response_model use it as is.
+    return PostResponse.model_construct(
+        title=row.title,
+        content=row.content,
+        id=row.id,
+        user_id=row.user_id,
+        date_posted=row.date_posted,
+        updated_at=row.updated_at,
+        author=UserPublic.model_construct(
+            id=row.user_id,
+            username=row.author_username,
+            image_file=row.author_image_file,
+            image_path=models.profile_image_path(row.author_image_file),
+        ),
+    )
+
+
+def dump_post_page(rows: Sequence[Row], limit: int) -> bytes:
+    # pydantic-core's encoder is the one FastAPI ends up using, so datetimes
+    # and string escaping match without going through model validation.
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    with timed("serialize"):
+        return to_json(
+            {
+                "items": [post_row_to_dict(row) for row in items],
+                "next_cursor": next_cursor,
+            },
+        )
+
+
+def dump_post_ndjson(row: Row) -> bytes:
+    return to_json(post_row_to_dict(row)) + b"\n"
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, bytes]]:
+    # Yields (line number, line) as soon as each line is complete, so a large
+    # upload is never held in memory as a whole. Blank lines are skipped.
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if buffer.strip():
+        yield line_number + 1, buffer
@@ -0,0 +1,107 @@
+import logging
+import time
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    nodes,
+    select_autoescape,
+)
+from jinja2.ext import Extension
+
+from app.cache import TTLCache
+from app.config import settings
+from app.instrumentation import add_timing
+from app.metrics import TEMPLATE_RENDER_DURATION
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = "templates"
+
+fragment_cache = TTLCache(settings.fragment_cache_size, name="fragment")
+
+
+class FragmentCacheExtension(Extension):
+    # {% cache post.id, post.updated_at %}...{% endcache %} stores the rendered
+    # block under the listed values. Put everything the block shows in the key:
+    # a change to any of them misses, and the stale entry ages out of the LRU.
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method(
+            "_cached_block",
+            [nodes.ContextReference(), nodes.List(parts)],
+        )
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _cached_block(self, context, parts, caller):
+        # url_for() renders absolute URLs, so the host is part of the key too.
+        request = context.get("request")
+        base_url = str(request.base_url) if request is not None else None
+        key = (context.name, base_url, *parts)
+        html = fragment_cache.get(key)
+        if html is not None:
+            return html
+        if self.environment.is_async:
+
+            async def render():
+                html = await caller()
+                fragment_cache.set(key, html)
+                return html
+
+            return render()
+        html = caller()
+        fragment_cache.set(key, html)
+        return html
+
+
+def record_render(name: str, seconds: float) -> None:
+    TEMPLATE_RENDER_DURATION.labels(name).observe(seconds)
+    add_timing("render", seconds)
+    logger.debug("rendered %s in %.2fms", name, seconds * 1000)
+
+
+class TimedJinja2Templates(Jinja2Templates):
+    # TemplateResponse renders eagerly, so timing the call times the render.
+    def TemplateResponse(self, request, name, *args, **kwargs):
+        start = time.perf_counter()
+        response = super().TemplateResponse(request, name, *args, **kwargs)
+        record_render(name, time.perf_counter() - start)
+        return response
+
+
+def make_templates(*, enable_async: bool = False) -> TimedJinja2Templates:
+    bytecode_cache = None
+    if settings.template_cache_dir:
+        # Sync and async environments compile the same source to different
+        # code, so they can't share cache files.
+        directory = Path(settings.template_cache_dir) / (
+            "async" if enable_async else "sync"
+        )
+        directory.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(directory))
+    return TimedJinja2Templates(
+        env=Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR),
+            autoescape=select_autoescape(),
+            enable_async=enable_async,
+            bytecode_cache=bytecode_cache,
+            extensions=[FragmentCacheExtension],
+        ),
+    )
+
+
+def warm_templates(*environments: Environment) -> None:
+    # Loads every template once at startup: from the bytecode cache when it is
+    # warm, otherwise compiling and writing it there for the next worker.
+    for env in environments:
+        for name in env.list_templates():
+            env.get_template(name)
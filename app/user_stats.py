@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+from collections.abc import Mapping
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app import models
+from app.database import engine
+
+# users.post_count and users.last_posted_at are kept up to date by every
+# write path that adds or removes posts, in the same transaction, so profile
+# reads never count posts. `python -m app.user_stats reconcile` recomputes
+# them in bulk after anything that went around those paths.
+
+
+def _post_count():
+    return (
+        select(func.count())
+        .where(models.Post.user_id == models.User.id)
+        .scalar_subquery()
+    )
+
+
+def _last_posted_at():
+    # max() over the (user_id, date_posted, id) index is a single seek, and
+    # stays right when the newest post is deleted or one is backdated.
+    return (
+        select(func.max(models.Post.date_posted))
+        .where(models.Post.user_id == models.User.id)
+        .scalar_subquery()
+    )
+
+
+async def apply_post_counts(db: AsyncSession, deltas: Mapping[int, int]) -> None:
+    # deltas maps user id -> posts added (or removed, if negative). Call it
+    # after the posts themselves have been written in the same transaction.
+    await db.flush()
+    for user_id, delta in deltas.items():
+        await db.execute(
+            update(models.User)
+            .where(models.User.id == user_id)
+            .values(
+                post_count=models.User.post_count + delta,
+                last_posted_at=_last_posted_at(),
+            )
+            .execution_options(synchronize_session=False),
+        )
+
+
+async def reconcile_user_stats(conn: AsyncConnection) -> int:
+    post_count = _post_count()
+    last_posted_at = _last_posted_at()
+    result = await conn.execute(
+        update(models.User)
+        .where(
+            or_(
+                models.User.post_count != post_count,
+                models.User.last_posted_at.is_distinct_from(last_posted_at),
+            ),
+        )
+        .values(post_count=post_count, last_posted_at=last_posted_at),
+    )
+    return result.rowcount
+
+
+async def main() -> None:
+    async with engine.begin() as conn:
+        fixed = await reconcile_user_stats(conn)
+    await engine.dispose()
+    print(f"reconciled post stats for {fixed} users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain per-user post stats.")
+    parser.add_argument("command", choices=["reconcile"])
+    parser.parse_args()
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from sqlalchemy import insert
+
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.response_cache import POSTS, response_cache
+from app.user_stats import apply_post_counts
+
+logger = logging.getLogger(__name__)
+
+
+class PostWriter:
+    # Group commit for create_post: concurrent requests queue their rows and a
+    # single task inserts them in one transaction once max_batch rows are
+    # waiting or max_delay has passed since the first, so SQLite pays one
+    # fsync and one lock acquisition per batch instead of per post.
+    def __init__(self, max_batch: int, max_delay_ms: float, queue_size: int) -> None:
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue[tuple[dict, asyncio.Future[int]]] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        # False once the task has died too, so create_post inserts directly.
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="post-writer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # Let queued posts land before shutting down.
+        if not self._task.done():
+            await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    async def submit(self, values: dict) -> int:
+        if not self.running:
+            raise RuntimeError("post writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        # Blocks once queue_size posts are waiting, pushing back on callers.
+        await self._queue.put((values, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), remaining),
+                    )
+                except TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception as exc:
+                # Keep the task alive for the next batch; whoever is still
+                # waiting on this one gets the error instead of hanging.
+                logger.exception("flushing %d posts failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future[int]]]) -> None:
+        rows = [values for values, _ in batch]
+        try:
+            ids = await self._insert(rows)
+        except Exception:
+            # One bad row shouldn't fail everyone else's post; retry them
+            # one at a time so only the offending caller gets the error.
+            logger.exception("batched insert of %d posts failed", len(rows))
+            await self._flush_individually(batch)
+            return
+        await self._invalidate()
+        for (_, future), post_id in zip(batch, ids, strict=True):
+            if not future.done():
+                future.set_result(post_id)
+
+    async def _flush_individually(
+        self,
+        batch: list[tuple[dict, asyncio.Future[int]]],
+    ) -> None:
+        inserted = False
+        for values, future in batch:
+            try:
+                [post_id] = await self._insert([values])
+            except Exception as exc:
+                if not future.done():
+                    future.set_exception(exc)
+                continue
+            inserted = True
+            if not future.done():
+                future.set_result(post_id)
+        if inserted:
+            await self._invalidate()
+
+    async def _invalidate(self) -> None:
+        # The posts are committed by now, so a cache outage must not turn
+        # them into errors: cached pages go stale until their TTL instead.
+        try:
+            await response_cache.invalidate(POSTS)
+        except Exception:
+            logger.exception("invalidating cached post pages failed")
+
+    async def _insert(self, rows: list[dict]) -> list[int]:
+        stmt = insert(models.Post).returning(
+            models.Post.id,
+            sort_by_parameter_order=True,
+        )
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(stmt, rows)
+            ids = list(result.scalars())
+            await apply_post_counts(
+                session,
+                Counter(values["user_id"] for values in rows),
+            )
+            await session.commit()
+        return ids
+
+
+post_writer = PostWriter(
+    max_batch=settings.post_write_batch_size,
+    max_delay_ms=settings.post_write_max_delay_ms,
+    queue_size=settings.post_write_queue_size,
+)
@@ -0,0 +1,178 @@
+"""Deleting an account with many posts: ORM cascade vs. batched purge.
+
+Run from the repository root:
+
+    python -m benchmarks.delete_user --posts 100000
+
+Seeds a temporary SQLite database, with the search index and its triggers,
+where one user owns --posts posts. It then deletes that user twice, once
+with the old session.delete(user) cascade and once the way delete_user does
+now, i.e. mark the row and let PostPurger remove the rest. For each it
+reports how long the request takes, the peak Python memory, and the longest
+time another writer had to wait for the lock while the delete ran.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+WRITER_PROBE_INTERVAL = 0.005
+
+
+def seed(path: Path, posts: int) -> None:
+    from sqlalchemy import create_engine
+
+    from app.database import Base
+    from app.search import REBUILD_SQL, SEARCH_INDEX_DDL
+
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE probe (n INTEGER)")
+    conn.executemany(
+        "INSERT INTO users (id, username, email, password_hash, post_count) "
+        "VALUES (?, ?, ?, '', ?)",
+        [
+            (1, "prolific", "prolific@example.com", posts),
+            (2, "other", "other@example.com", 0),
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO posts (title, content, user_id, date_posted) VALUES (?, ?, 1, ?)",
+        (
+            (
+                f"post {i}",
+                "lorem ipsum dolor sit amet " * 20,
+                (start - timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            )
+            for i in range(posts)
+        ),
+    )
+    for statement in SEARCH_INDEX_DDL:
+        conn.execute(statement)
+    conn.execute(REBUILD_SQL)
+    conn.commit()
+    conn.close()
+
+
+async def probe_writer(path: Path, stop: asyncio.Event) -> float:
+    # Another process's view: how long a one-row write has to wait.
+    conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+    worst = 0.0
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.to_thread(conn.execute, "INSERT INTO probe VALUES (1)")
+            await asyncio.to_thread(conn.commit)
+            worst = max(worst, time.perf_counter() - start)
+            await asyncio.sleep(WRITER_PROBE_INTERVAL)
+    finally:
+        conn.close()
+    return worst
+
+
+async def measure(path: Path, delete) -> None:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_writer(path, stop))
+    await asyncio.sleep(0.05)
+    tracemalloc.start()
+    request_seconds, total_seconds = await delete()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stop.set()
+    worst_wait = await probe
+    print(
+        f"  request={request_seconds * 1000:9.1f}ms "
+        f"done={total_seconds * 1000:9.1f}ms "
+        f"peak_mem={peak / 1024 / 1024:7.1f}MiB "
+        f"max_writer_wait={worst_wait * 1000:8.1f}ms",
+    )
+
+
+async def orm_cascade(path: Path) -> tuple[float, float]:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from app import models
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    start = time.perf_counter()
+    async with AsyncSession(engine) as session:
+        user = await session.get(models.User, 1)
+        await session.delete(user)
+        await session.commit()
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed, elapsed
+
+
+async def marked_and_purged(batch_size: int, pause_ms: float) -> tuple[float, float]:
+    from app import models
+    from app.database import AsyncSessionLocal, engine
+    from app.purge import PostPurger
+
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        user = await session.get(models.User, 1)
+        user.deleted_at = datetime.now(UTC)
+        user.token_version += 1
+        await session.commit()
+    request_seconds = time.perf_counter() - start
+    # No other workers here to outwait, so no grace period before the row.
+    await PostPurger(batch_size, pause_ms, grace_seconds=0).purge(1)
+    total_seconds = time.perf_counter() - start
+    await engine.dispose()
+    return request_seconds, total_seconds
+
+
+async def main(
+    posts: int,
+    batch_size: int,
+    pause_ms: float,
+    purge_path: Path,
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = Path(tmp) / "seeded.db"
+        start = time.perf_counter()
+        seed(seeded, posts)
+        print(f"seeded {posts:,} posts in {time.perf_counter() - start:.1f}s")
+
+        orm_path = Path(tmp) / "orm.db"
+        shutil.copy(seeded, orm_path)
+        print("session.delete(user) with cascade='all, delete-orphan'")
+        await measure(orm_path, lambda: orm_cascade(orm_path))
+
+        shutil.copy(seeded, purge_path)
+        print(
+            f"mark deleted, then PostPurger in batches of {batch_size} "
+            f"with {pause_ms}ms pauses",
+        )
+        await measure(purge_path, lambda: marked_and_purged(batch_size, pause_ms))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--pause-ms", type=float, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as app_tmp:
+        # app.database binds its engine at import, so point it at the copy
+        # the purge runs against before anything from app is imported.
+        purge_path = Path(app_tmp) / "purge.db"
+        os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite+aiosqlite:///{purge_path}"
+        os.environ.pop("SQLALCHEMY_READ_DATABASE_URL", None)
+        os.environ.setdefault(
+            "SECRET_KEY",
+            "benchmark-only-secret-key-not-for-production",
+        )
+        asyncio.run(main(args.posts, args.batch_size, args.pause_ms, purge_path))
@@ -0,0 +1,132 @@
+"""Case-insensitive email lookups with and without the lower(email) index.
+
+Run from the repository root:
+
+    python -m benchmarks.email_lookup --users 1000000
+
+Seeds a temporary SQLite database without the index, times the login query
+and the signup conflict probe as full scans, applies the migration that
+builds the index (reporting how long that takes at this size) and times the
+same queries again.
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, or_, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import models
+from app.database import Base
+from app.migrations import MIGRATIONS
+
+EMAIL_INDEX_VERSION = 6
+
+
+def seed(path: Path, users: int) -> None:
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX ix_users_email_lower")
+    # Mixed-case addresses, as people type them.
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash) VALUES (?, ?, '')",
+        ((f"user{i}", f"User{i}@Example.com") for i in range(users)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def select_login(email: str):
+    return select(models.User).where(
+        func.lower(models.User.email) == func.lower(email),
+    )
+
+
+def select_conflict(username: str, email: str):
+    return (
+        select(models.User.username)
+        .where(
+            or_(
+                models.User.username == username,
+                func.lower(models.User.email) == func.lower(email),
+            ),
+        )
+        .limit(1)
+    )
+
+
+async def time_query(conn, stmt, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        (await conn.execute(stmt)).all()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def time_queries(conn, users: int, rounds: int) -> dict[str, float]:
+    last = users - 1
+    return {
+        "login (hit)": await time_query(
+            conn, select_login(f"user{last}@example.COM"), rounds,
+        ),
+        "login (miss)": await time_query(
+            conn, select_login("nobody@example.com"), rounds,
+        ),
+        "signup probe": await time_query(
+            conn, select_conflict("newcomer", "Newcomer@example.com"), rounds,
+        ),
+    }
+
+
+async def main(users: int, rounds: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "users.db"
+        start = time.perf_counter()
+        seed(path, users)
+        print(f"seeded {users:,} users in {time.perf_counter() - start:.1f}s")
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.connect() as conn:
+            scan = await time_queries(conn, users, rounds)
+
+        step = next(m for m in MIGRATIONS if m.version == EMAIL_INDEX_VERSION)
+        start = time.perf_counter()
+        async with engine.begin() as conn:
+            await step.apply(conn)
+        print(
+            f"migration {step.version} ({step.description}) took "
+            f"{time.perf_counter() - start:.1f}s",
+        )
+
+        async with engine.connect() as conn:
+            indexed = await time_queries(conn, users, rounds)
+            compiled = select_login("x@example.com").compile(dialect=conn.dialect)
+            plan = await conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {compiled}",
+                tuple(compiled.params.values()),
+            )
+            print("login plan:", "; ".join(row[-1] for row in plan))
+        await engine.dispose()
+
+        for name in scan:
+            print(
+                f"{name:<14} scan={scan[name]:9.3f}ms index={indexed[name]:7.3f}ms "
+                f"speedup={scan[name] / indexed[name]:9.1f}x",
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.rounds))
@@ -0,0 +1,209 @@
+"""Fan-out of live post events to many connected feed clients.
+
+Run from the repository root:
+
+    python -m benchmarks.feed_fanout --clients 10000 --events 300
+
+Opens --clients connections to /api/posts/stream by calling the ASGI app
+directly, every other one over WebSocket and the rest over SSE, plus --slow
+clients that never finish reading. It then publishes --events post events
+through feed_hub one after another and reports how long the hub's fan-out
+takes, how long until every client has each event, the memory held per
+connected client, and how many slow clients were dropped for falling
+FEED_CLIENT_QUEUE_SIZE events behind.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import UTC, datetime
+
+
+class Clients:
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+        self.received = 0
+        self.first: float | None = None
+        self.all_received = asyncio.Event()
+        self.disconnect = asyncio.Event()
+        self.release_slow = asyncio.Event()
+
+    def reset(self) -> None:
+        self.received = 0
+        self.first = None
+        self.all_received.clear()
+
+    def record(self, events: int = 1) -> None:
+        if self.first is None:
+            self.first = time.perf_counter()
+        self.received += events
+        if self.received >= self.expected:
+            self.all_received.set()
+
+
+def base_scope(scope_type: str, n: int) -> dict:
+    return {
+        "type": scope_type,
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "scheme": "http" if scope_type == "http" else "ws",
+        "path": "/api/posts/stream",
+        "raw_path": b"/api/posts/stream",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": (f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def sse_client(app, n: int, clients: Clients, slow: bool) -> None:
+    scope = {**base_scope("http", n), "method": "GET"}
+
+    async def receive() -> dict:
+        await clients.disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] != "http.response.body":
+            return
+        if slow:
+            await clients.release_slow.wait()
+        elif b"data:" in message["body"]:
+            clients.record(message["body"].count(b"data:"))
+        if clients.disconnect.is_set():
+            raise OSError("client went away")
+
+    await app(scope, receive, send)
+
+
+async def websocket_client(app, n: int, clients: Clients, slow: bool) -> None:
+    scope = {**base_scope("websocket", n), "subprotocols": []}
+    connected = False
+
+    async def receive() -> dict:
+        nonlocal connected
+        if not connected:
+            connected = True
+            return {"type": "websocket.connect"}
+        await clients.disconnect.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send(message: dict) -> None:
+        if message["type"] != "websocket.send":
+            return
+        if slow:
+            await clients.release_slow.wait()
+        else:
+            clients.record()
+
+    await app(scope, receive, send)
+
+
+def make_post(post_id: int):
+    from app.schemas import PostResponse, UserPublic
+
+    now = datetime.now(UTC)
+    return PostResponse.model_construct(
+        title=f"post {post_id}",
+        content="lorem ipsum dolor sit amet " * 20,
+        id=post_id,
+        user_id=1,
+        date_posted=now,
+        updated_at=now,
+        author=UserPublic.model_construct(
+            id=1,
+            username="bench",
+            image_file=None,
+            image_path="/static/profile_pics/default.jpg",
+        ),
+    )
+
+
+def percentile(samples: list[float], pct: int) -> float:
+    return statistics.quantiles(samples, n=100)[pct - 1]
+
+
+async def main(clients_count: int, slow_count: int, events: int) -> None:
+    from app.feed import feed_hub
+    from app.main import app
+
+    clients = Clients(expected=clients_count)
+    fan_out_seconds = []
+    fan_out = feed_hub.fan_out
+
+    def timed_fan_out(text: str) -> None:
+        start = time.perf_counter()
+        fan_out(text)
+        fan_out_seconds.append(time.perf_counter() - start)
+
+    feed_hub.fan_out = timed_fan_out
+    feed_hub.start()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    tasks = []
+    for n in range(clients_count + slow_count):
+        client = websocket_client if n % 2 else sse_client
+        task = client(app, n, clients, slow=n >= clients_count)
+        tasks.append(asyncio.create_task(task))
+    while feed_hub.subscribers < len(tasks):
+        await asyncio.sleep(0.01)
+    connect_seconds = time.perf_counter() - start
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"connected {clients_count:,} clients and {slow_count} slow ones "
+        f"in {connect_seconds:.2f}s, "
+        f"{(after - before) / len(tasks) / 1024:.1f} KiB each",
+    )
+
+    delivered = []
+    first_seen = []
+    for post_id in range(1, events + 1):
+        clients.reset()
+        start = time.perf_counter()
+        await feed_hub.publish("created", make_post(post_id))
+        await clients.all_received.wait()
+        delivered.append(time.perf_counter() - start)
+        first_seen.append(clients.first - start)
+
+    def ms(samples: list[float], pct: int) -> str:
+        return f"{percentile(samples, pct) * 1000:8.1f}ms"
+
+    print(f"{events} events to {clients_count:,} clients")
+    for label, samples in [
+        ("hub fan_out", fan_out_seconds),
+        ("first client has it", first_seen),
+        ("every client has it", delivered),
+    ]:
+        print(f"  {label:<20} p50={ms(samples, 50)} p99={ms(samples, 99)}")
+    print(f"  deliveries/s         {clients_count * events / sum(delivered):,.0f}")
+    still_connected = feed_hub.subscribers - clients_count
+    print(f"  slow clients dropped {slow_count - still_connected} of {slow_count}")
+
+    clients.disconnect.set()
+    clients.release_slow.set()
+    await feed_hub.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--slow", type=int, default=100)
+    parser.add_argument(
+        "--events",
+        type=int,
+        default=300,
+        help="more than FEED_CLIENT_QUEUE_SIZE, so slow clients get dropped",
+    )
+    args = parser.parse_args()
+    os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["INSTRUMENTATION_ENABLED"] = "false"
+    asyncio.run(main(args.clients, args.slow, args.events))
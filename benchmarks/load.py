@@ -0,0 +1,317 @@
+"""Load test for the API and HTML routes against a seeded temporary database.
+
+Run from the repository root:
+
+    python -m benchmarks.load --users 1000 --posts 100000 --concurrency 20
+    python -m benchmarks.load --save benchmarks/baseline.json
+    python -m benchmarks.load --compare benchmarks/baseline.json
+
+The app is driven in-process through httpx's ASGITransport, so numbers
+cover routing, auth, queries, serialization and rendering but no network.
+Each workload reports p50/p95/p99 latency, throughput and DB queries per
+request. --save writes the results as JSON; --compare prints the change
+against a file written earlier with the same options.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+PASSWORD = "benchmark-password"
+SEED_CHUNK_SIZE = 10_000
+
+Request = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+class Dataset:
+    def __init__(self, users: int, posts: int, tokens: list[str]) -> None:
+        self.users = users
+        self.posts = posts
+        self.tokens = tokens
+
+
+def seed(path: Path, users: int, posts: int) -> None:
+    # Imported here so the settings pick up the temp database URL first.
+    from sqlalchemy import create_engine, insert
+
+    from app import models
+    from app.auth import hash_password
+    from app.database import engine
+    from app.migrations import upgrade
+
+    async def migrate():
+        await upgrade(engine)
+        await engine.dispose()
+
+    asyncio.run(migrate())
+    sync_engine = create_engine(f"sqlite:///{path}")
+    # One Argon2 hash shared by every account keeps seeding fast.
+    password_hash = hash_password(PASSWORD)
+    start = datetime.now(UTC)
+    rng = random.Random(0)
+    with sync_engine.begin() as conn:
+        for offset in range(0, users, SEED_CHUNK_SIZE):
+            conn.execute(
+                insert(models.User),
+                [
+                    {
+                        "username": f"user{i}",
+                        "email": f"user{i}@example.com",
+                        "password_hash": password_hash,
+                    }
+                    for i in range(offset, min(offset + SEED_CHUNK_SIZE, users))
+                ],
+            )
+        for offset in range(0, posts, SEED_CHUNK_SIZE):
+            conn.execute(
+                insert(models.Post),
+                [
+                    {
+                        "title": f"Post {i}",
+                        "content": f"Synthetic post number {i}. " * 8,
+                        "user_id": rng.randint(1, users),
+                        "date_posted": start - timedelta(minutes=i),
+                    }
+                    for i in range(offset, min(offset + SEED_CHUNK_SIZE, posts))
+                ],
+            )
+    sync_engine.dispose()
+
+
+async def feed(client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+    return await client.get("/api/posts")
+
+
+async def feed_html(client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+    return await client.get("/")
+
+
+def single_post(dataset: Dataset) -> Request:
+    async def request(client, rng):
+        return await client.get(f"/api/posts/{rng.randint(1, dataset.posts)}")
+
+    return request
+
+
+def create_post(dataset: Dataset) -> Request:
+    async def request(client, rng):
+        return await client.post(
+            "/api/posts",
+            json={"title": "Load test", "content": "Created by benchmarks.load"},
+            headers={"Authorization": f"Bearer {rng.choice(dataset.tokens)}"},
+        )
+
+    return request
+
+
+def login(dataset: Dataset) -> Request:
+    async def request(client, rng):
+        return await client.post(
+            "/api/users/token",
+            data={
+                "username": f"user{rng.randrange(dataset.users)}@example.com",
+                "password": PASSWORD,
+            },
+        )
+
+    return request
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+
+async def run_workload(
+    client: httpx.AsyncClient,
+    request: Request,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    queries: QueryCounter,
+) -> dict:
+    rng = random.Random(1)
+    for _ in range(warmup):
+        await request(client, rng)
+
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+    remaining = iter(range(requests))
+
+    async def worker():
+        # Workers share one iterator, so exactly `requests` calls are made
+        # with at most `concurrency` in flight.
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await request(client, rng)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    queries_before = queries.count
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "queries_per_request": round((queries.count - queries_before) / requests, 2),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from sqlalchemy import event
+
+    from app import models
+    from app.auth import create_access_token
+    from app.database import engine, read_engine
+    from app.main import app
+
+    queries = QueryCounter()
+    for bench_engine in {engine, read_engine}:
+        event.listen(bench_engine.sync_engine, "before_cursor_execute", queries)
+
+    dataset = Dataset(
+        args.users,
+        args.posts,
+        [
+            create_access_token(
+                models.User(
+                    id=user_id,
+                    username=f"user{user_id - 1}",
+                    token_version=0,
+                ),
+            )
+            for user_id in range(1, min(args.users, 100) + 1)
+        ],
+    )
+    workloads: dict[str, tuple[Request, int]] = {
+        "feed": (feed, args.requests),
+        "feed_html": (feed_html, args.requests),
+        "single_post": (single_post(dataset), args.requests),
+        "create_post": (create_post(dataset), args.requests),
+        "login": (login(dataset), args.login_requests),
+    }
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.workloads:
+                request, requests = workloads[name]
+                results[name] = await run_workload(
+                    client,
+                    request,
+                    requests,
+                    args.concurrency,
+                    args.warmup,
+                    queries,
+                )
+                print_result(name, results[name])
+    return results
+
+
+def print_result(name: str, result: dict) -> None:
+    print(
+        f"{name:<12} p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+        f"p99={result['p99_ms']:8.2f}ms {result['throughput_rps']:9.1f} req/s "
+        f"queries/req={result['queries_per_request']:5.2f} "
+        f"statuses={result['statuses']}",
+    )
+
+
+def compare(baseline: dict, results: dict) -> None:
+    if baseline["config"] != results["config"]:
+        print("warning: baseline was recorded with different options")
+    print("\nchange vs. baseline (negative latency / positive throughput is better)")
+    for name, result in results["workloads"].items():
+        before = baseline["workloads"].get(name)
+        if before is None:
+            continue
+        changes = " ".join(
+            f"{metric}={(result[metric] - before[metric]) / before[metric]:+7.1%}"
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+            if before[metric]
+        )
+        print(f"{name:<12} {changes}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument(
+        "--workloads",
+        type=lambda value: value.split(","),
+        default=["feed", "feed_html", "single_post", "create_post", "login"],
+        help="comma-separated subset, run in the given order",
+    )
+    parser.add_argument(
+        "--no-response-cache",
+        action="store_true",
+        help="measure the routes themselves rather than cache hits",
+    )
+    parser.add_argument(
+        "--write-behind",
+        action="store_true",
+        help="batch post creation through the group-commit writer",
+    )
+    parser.add_argument("--save", type=Path, help="write results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="JSON baseline to diff against")
+    args = parser.parse_args()
+
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("save", "compare")
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+        os.environ.pop("SQLALCHEMY_READ_DATABASE_URL", None)
+        os.environ.setdefault(
+            "SECRET_KEY",
+            "benchmark-only-secret-key-not-for-production",
+        )
+        # One client address would trip the per-IP limit within a second.
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        if args.no_response_cache:
+            os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+        if args.write_behind:
+            os.environ["POST_WRITE_BEHIND"] = "true"
+        seed(db_path, args.users, args.posts)
+        workloads = asyncio.run(run(args))
+
+    results = {"config": config, "workloads": workloads}
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), results)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nsaved {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Latency of unrelated requests while a burst of logins is being hashed.
+
+Run from the repository root:
+
+    python -m benchmarks.login_storm --logins 200 --concurrency 50
+
+The app runs on its own engines against a temporary SQLite database, so
+the single write connection is shared exactly as it is in production.
+Each scenario probes GET /api/users/1 and POST /api/posts in loops and
+reports their latency. "blocking" swaps the pooled verify back for the
+synchronous Argon2 call so the difference in event-loop stalls is visible
+side by side.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import httpx
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchmark-password"
+
+Probe = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+async def blocking_verify(plain_password: str, hashed_password: str) -> bool:
+    from app.auth import verify_password
+
+    return verify_password(plain_password, hashed_password)
+
+
+async def probe(
+    client: httpx.AsyncClient,
+    stop: asyncio.Event,
+    request: Probe,
+) -> list[float]:
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await request(client)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def storm(client: httpx.AsyncClient, logins: int, concurrency: int) -> dict:
+    limiter = asyncio.Semaphore(concurrency)
+    statuses: dict[int, int] = {}
+
+    async def login():
+        async with limiter:
+            response = await client.post(
+                "/api/users/token",
+                data={"username": EMAIL, "password": PASSWORD},
+            )
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return {"elapsed": time.perf_counter() - start, "statuses": statuses}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    logins: int,
+    concurrency: int,
+    token: str,
+) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    probes = {
+        "read": lambda client: client.get("/api/users/1"),
+        "write": lambda client: client.post(
+            "/api/posts",
+            json={"title": "probe", "content": "probe"},
+            headers=headers,
+        ),
+    }
+    stop = asyncio.Event()
+    tasks = {
+        probe_name: asyncio.create_task(probe(client, stop, request))
+        for probe_name, request in probes.items()
+    }
+    if logins:
+        result = await storm(client, logins, concurrency)
+    else:
+        await asyncio.sleep(1)
+        result = {"elapsed": 1.0, "statuses": {}}
+    stop.set()
+
+    print(
+        f"{name:<10} logins/s={logins / result['elapsed']:7.1f} "
+        f"statuses={result['statuses']}",
+    )
+    for probe_name, task in tasks.items():
+        samples = await task
+        quantiles = statistics.quantiles(samples, n=100)
+        print(
+            f"  {probe_name:<6} probes={len(samples):>6} "
+            f"p50={quantiles[49]:7.2f}ms p99={quantiles[98]:7.2f}ms "
+            f"max={max(samples):8.2f}ms",
+        )
+
+
+async def main(logins: int, concurrency: int) -> None:
+    # Imported here so the settings pick up the temp database URL first.
+    from app.config import settings
+    from app.database import engine, read_engine
+    from app.main import app
+    from app.migrations import upgrade
+    from routers import users
+
+    await upgrade(engine)
+    # The storm is one client hammering one account, which the login
+    # limits would cut off after a handful of attempts. A probe answered
+    # from the in-memory response cache never yields to the event loop.
+    settings.rate_limit_enabled = False
+    settings.response_cache_enabled = False
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post(
+            "/api/users",
+            json={"username": "bench", "email": EMAIL, "password": PASSWORD},
+        )
+        response = await client.post(
+            "/api/users/token",
+            data={"username": EMAIL, "password": PASSWORD},
+        )
+        token = response.json()["access_token"]
+        await run_scenario(client, "idle", 0, concurrency, token)
+        await run_scenario(client, "pooled", logins, concurrency, token)
+
+        pooled_verify = users.verify_password_async
+        users.verify_password_async = blocking_verify
+        try:
+            await run_scenario(client, "blocking", logins, concurrency, token)
+        finally:
+            users.verify_password_async = pooled_verify
+
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SQLALCHEMY_DATABASE_URL"] = (
+            f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"
+        )
+        os.environ.pop("SQLALCHEMY_READ_DATABASE_URL", None)
+        asyncio.run(main(args.logins, args.concurrency))
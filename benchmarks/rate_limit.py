@@ -0,0 +1,111 @@
+"""Per-request overhead of the rate limiter, by backend.
+
+Run from the repository root:
+
+    python -m benchmarks.rate_limit --requests 20000
+
+Times RateLimitMiddleware in front of an ASGI app that does nothing, so
+what is left is the limiter: an anonymous request charges the IP bucket,
+a request with a bearer token also charges the user bucket. Each backend is
+measured spread over many client addresses and for one address whose
+bucket is empty, which is what a flood looks like from the inside.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+
+async def noop_app(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message: dict) -> None:
+    pass
+
+
+def make_scope(ip: str, headers: list[tuple[bytes, bytes]]) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/posts",
+        "headers": headers,
+        "client": (ip, 50000),
+    }
+
+
+async def time_requests(app, scopes: list[dict]) -> tuple[float, float]:
+    samples = []
+    for scope in scopes:
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(samples), statistics.quantiles(samples, n=100)[98]
+
+
+async def main(requests: int, clients: int) -> None:
+    from app import models
+    from app.auth import create_access_token
+    from app.rate_limit import (
+        MemoryRateLimitBackend,
+        RateLimitMiddleware,
+        SQLiteRateLimitBackend,
+        rate_limiter,
+    )
+
+    token = create_access_token(
+        models.User(id=1, username="bench", token_version=0),
+    )
+    bearer = [(b"authorization", f"Bearer {token}".encode())]
+    addresses = [f"10.0.{i // 256 % 256}.{i % 256}" for i in range(clients)]
+    spread = [make_scope(addresses[i % clients], []) for i in range(requests)]
+    cases = {
+        "anonymous": spread,
+        "bearer": [{**scope, "headers": bearer} for scope in spread],
+        "flooding": [make_scope("203.0.113.1", [])] * requests,
+    }
+
+    base = {
+        name: await time_requests(noop_app, scopes) for name, scopes in cases.items()
+    }
+    limited = RateLimitMiddleware(noop_app)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": MemoryRateLimitBackend(maxsize=100_000),
+            "sqlite": SQLiteRateLimitBackend(str(Path(tmp) / "rate_limits.db")),
+        }
+        for backend_name, backend in backends.items():
+            rate_limiter.backend = backend
+            for name, scopes in cases.items():
+                p50, p99 = await time_requests(limited, scopes)
+                base_p50, base_p99 = base[name]
+                print(
+                    f"{backend_name:<7} {name:<10} "
+                    f"p50={p50 - base_p50:7.1f}us p99={p99 - base_p99:7.1f}us "
+                    f"checks/s={1_000_000 / p50:9.0f}",
+                )
+            await rate_limiter.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=1_000,
+        help="distinct addresses the spread cases rotate through",
+    )
+    args = parser.parse_args()
+    os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+    os.environ["RATE_LIMIT_ENABLED"] = "true"
+    asyncio.run(main(args.requests, args.clients))
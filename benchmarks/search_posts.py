@@ -0,0 +1,117 @@
+"""FTS5 search vs. a LIKE '%q%' scan over a synthetic posts table.
+
+Run from the repository root:
+
+    python -m benchmarks.search_posts --posts 1000000
+
+Seeds a temporary SQLite database, backfills the FTS index with the same
+rebuild the `python -m app.search rebuild` command uses, then times the
+first page of GET /api/posts/search's query against the LIKE equivalent.
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import models
+from app.database import Base
+from app.search import REBUILD_SQL, SEARCH_INDEX_DDL, select_search_rows
+from app.serializers import select_post_rows
+
+VOCABULARY = [f"word{i}" for i in range(5_000)]
+# One term that is everywhere, one in every 10,000th post, one in none and
+# a two-term AND; LIKE only stays cheap while matches are dense.
+RARE_TERM = "zephyr"
+QUERIES = ["word17", RARE_TERM, "absent", "word42 word43"]
+
+
+def seed(path: Path, posts: int) -> None:
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    rng = random.Random(0)
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO users (id, username, email, password_hash) "
+        "VALUES (1, 'bench', 'bench@example.com', '')",
+    )
+
+    def rows():
+        for i in range(posts):
+            content = " ".join(rng.choices(VOCABULARY, k=60))
+            if i % 10_000 == 0:
+                content += f" {RARE_TERM}"
+            yield (
+                " ".join(rng.choices(VOCABULARY, k=6)),
+                content,
+                1,
+                (start - timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            )
+
+    conn.executemany(
+        "INSERT INTO posts (title, content, user_id, date_posted) VALUES (?, ?, ?, ?)",
+        rows(),
+    )
+    for statement in SEARCH_INDEX_DDL:
+        conn.execute(statement)
+    conn.execute(REBUILD_SQL)
+    conn.commit()
+    conn.close()
+
+
+def select_like_rows(q: str, limit: int):
+    pattern = f"%{q}%"
+    return (
+        select_post_rows()
+        .where(or_(models.Post.title.like(pattern), models.Post.content.like(pattern)))
+        .order_by(models.Post.date_posted.desc(), models.Post.id.desc())
+        .limit(limit + 1)
+    )
+
+
+async def time_query(conn, stmt, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        (await conn.execute(stmt)).all()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main(posts: int, rounds: int, limit: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "search.db"
+        start = time.perf_counter()
+        seed(path, posts)
+        print(f"seeded and indexed {posts:,} posts in {time.perf_counter() - start:.1f}s")
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.connect() as conn:
+            for q in QUERIES:
+                fts_ms = await time_query(conn, select_search_rows(q, None, limit), rounds)
+                like_ms = await time_query(conn, select_like_rows(q, limit), rounds)
+                print(
+                    f"q={q!r:<16} fts={fts_ms:9.2f}ms like={like_ms:9.2f}ms "
+                    f"speedup={like_ms / fts_ms:7.1f}x",
+                )
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.posts, args.rounds, args.limit))
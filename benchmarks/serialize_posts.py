@@ -0,0 +1,96 @@
+"""Rows/sec for post list serialization: response_model path vs. fast path.
+
+Run from the repository root:
+
+    python -m benchmarks.serialize_posts --rows 100 --rounds 200
+
+"model" validates ORM objects into PostPage the way FastAPI does for
+response_model=PostPage and dumps the result; "fast" feeds column rows to
+dump_post_page. Both outputs are checked to be byte-identical first.
+"""
+
+import argparse
+import time
+from collections import namedtuple
+from datetime import UTC, datetime, timedelta
+
+from pydantic import TypeAdapter
+from app import models
+from app.pagination import build_page
+from app.schemas import PostPage
+from app.serializers import POST_ROW_COLUMNS, dump_post_page
+
+
+def make_posts(count: int) -> list[models.Post]:
+    authors = [
+        models.User(
+            id=i,
+            username=f"user{i}",
+            image_file=f"user{i}.png" if i % 2 else None,
+        )
+        for i in range(1, 11)
+    ]
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    return [
+        models.Post(
+            id=i,
+            title=f"Post number {i}",
+            content="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8,
+            user_id=authors[i % 10].id,
+            date_posted=start - timedelta(minutes=i),
+            author=authors[i % 10],
+        )
+        for i in range(count)
+    ]
+
+
+def make_rows(posts: list[models.Post]) -> list[tuple]:
+    # Stand-in for the Row objects select_post_rows() returns; the fast path
+    # only reads them by column label.
+    PostRow = namedtuple("PostRow", [column.key for column in POST_ROW_COLUMNS])
+    return [
+        PostRow(
+            post.title,
+            post.content,
+            post.id,
+            post.user_id,
+            post.date_posted,
+            post.updated_at,
+            post.author.username,
+            post.author.image_file,
+        )
+        for post in posts
+    ]
+
+
+def measure(name: str, func, rows: int, rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<6} {rows * rounds / elapsed:12,.0f} rows/sec")
+
+
+def main(rows: int, rounds: int) -> None:
+    posts = make_posts(rows + 1)
+    post_rows = make_rows(posts)
+    adapter = TypeAdapter(PostPage)
+
+    def model_path() -> bytes:
+        page = adapter.validate_python(build_page(posts, rows), from_attributes=True)
+        return adapter.dump_json(page)
+
+    def fast_path() -> bytes:
+        return dump_post_page(post_rows, rows)
+
+    assert model_path() == fast_path(), "fast path output differs"
+    measure("model", model_path, rows, rounds)
+    measure("fast", fast_path, rows, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    main(args.rows, args.rounds)
@@ -0,0 +1,59 @@
+"""Cold-start cost of a worker: importing app.main and running its lifespan.
+
+Run from the repository root against a migrated database:
+
+    python -m app.migrations upgrade
+    python -m benchmarks.startup --runs 10
+
+Each run is a fresh interpreter, so nothing is shared through sys.modules.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(startup())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "lifespan_ms": (time.perf_counter() - imported) * 1000,
+}))
+"""
+
+
+def main(runs: int) -> None:
+    samples = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-c", PROBE],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.splitlines()[-1],
+        )
+        for _ in range(runs)
+    ]
+    for key in ("import_ms", "lifespan_ms"):
+        values = [sample[key] for sample in samples]
+        print(
+            f"{key:<12} median={statistics.median(values):8.1f} "
+            f"min={min(values):8.1f} max={max(values):8.1f}",
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    main(args.runs)
@@ -1,55 +1,311 @@
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
 
 from app import models
-from app.auth import CurrentUser
-from app.database import get_db
-from app.schemas import PostCreate, PostResponse, PostUpdate
+from app.auth import CurrentUserId, load_user
+from app.config import settings
+from app.database import ReadSessionLocal, get_db
+from app.feed import Subscription, feed_hub
+from app.pagination import build_page, paginate_posts
+from app.response_cache import POSTS, USERS, CachedRoute, cached, response_cache
+from app.schemas import (
+    BulkImportResult,
+    PostCreate,
+    PostImport,
+    PostPage,
+    PostResponse,
+    PostSearchPage,
+    PostUpdate,
+)
+from app.search import build_search_page, search_supported, select_search_rows
+from app.serializers import (
+    dump_post_ndjson,
+    dump_post_page,
+    iter_ndjson_lines,
+    post_row_to_response,
+    select_post_rows,
+)
+from app.user_stats import apply_post_counts
+from app.write_behind import post_writer
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
+router = APIRouter(route_class=CachedRoute)
 
-@router.get("", response_model=list[PostResponse])
-async def get_posts(db: Annotated[AsyncSession, Depends(get_db)]):
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .order_by(models.Post.date_posted.desc()),
-    )
-    return result.scalars().all()
+
+@router.get("", response_model=PostPage)
+@cached(POSTS, USERS)
+async def get_posts(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    cursor: str | None = None,
+    limit: Annotated[
+        int,
+        Query(ge=1, le=settings.max_posts_per_page),
+    ] = settings.posts_per_page,
+):
+    result = await db.execute(paginate_posts(select_post_rows(), cursor, limit))
+    if settings.fast_post_lists:
+        return Response(
+            dump_post_page(result.all(), limit),
+            media_type="application/json",
+        )
+    return build_page([post_row_to_response(row) for row in result], limit)
 
 
 @router.post("", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
 async def create_post(
     post: PostCreate,
-    current_user: CurrentUser,
+    current_user_id: CurrentUserId,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
+    if post_writer.running:
+        # The response embeds the author; the user cache nearly always has it.
+        author = await load_user(db, current_user_id)
+        if author is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        # Hand this request's connection back first: on SQLite the write pool
+        # holds one connection, and the writer task needs it to flush.
+        await db.close()
+        now = datetime.now(UTC)
+        values = {
+            "title": post.title,
+            "content": post.content,
+            "user_id": current_user_id,
+            "date_posted": now,
+            "updated_at": now,
+        }
+        post_id = await post_writer.submit(values)
+        # Everything but the id is known up front, so no read-back is needed.
+        response = PostResponse.model_validate(
+            {**values, "id": post_id, "author": author},
+        )
+        await feed_hub.publish("created", response)
+        return response
+
     new_post = models.Post(
         title=post.title,
         content=post.content,
-        user_id=current_user.id,
+        user_id=current_user_id,
     )
     db.add(new_post)
+    await apply_post_counts(db, {current_user_id: 1})
     await db.commit()
+    await response_cache.invalidate(POSTS)
     await db.refresh(new_post, attribute_names=["author"])
-    return new_post
+    response = PostResponse.model_validate(new_post)
+    await feed_hub.publish("created", response)
+    return response
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkImportResult,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        },
+    },
+)
+async def bulk_import_posts(
+    request: Request,
+    current_user_id: CurrentUserId,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    # One PostImport per line, inserted as the current user with executemany
+    # in chunks of BULK_IMPORT_CHUNK_SIZE, each chunk in its own transaction.
+    start = time.perf_counter()
+    inserted = 0
+    batch = []
+
+    async def flush():
+        nonlocal inserted
+        await db.execute(insert(models.Post), batch)
+        await apply_post_counts(db, {current_user_id: len(batch)})
+        await db.commit()
+        inserted += len(batch)
+        batch.clear()
+
+    try:
+        async for line_number, line in iter_ndjson_lines(request.stream()):
+            try:
+                post = PostImport.model_validate_json(line)
+            except ValidationError as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail={
+                        "line": line_number,
+                        "inserted": inserted,
+                        # The input is the raw bytes of the line, which
+                        # isn't JSON serializable; the line number locates it.
+                        "errors": exc.errors(
+                            include_url=False,
+                            include_context=False,
+                            include_input=False,
+                        ),
+                    },
+                )
+            row = post.model_dump(exclude_none=True)
+            row["user_id"] = current_user_id
+            batch.append(row)
+            if len(batch) >= settings.bulk_import_chunk_size:
+                await flush()
+        if batch:
+            await flush()
+    finally:
+        if inserted:
+            await response_cache.invalidate(POSTS)
+
+    elapsed = time.perf_counter() - start
+    return BulkImportResult(
+        inserted=inserted,
+        elapsed_seconds=round(elapsed, 3),
+        rows_per_second=round(inserted / elapsed, 1) if elapsed else 0.0,
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_posts():
+    async def stream():
+        # The response outlives the request's get_db session, so the export
+        # opens its own and reads through a server-side cursor.
+        start = time.perf_counter()
+        exported = 0
+        async with ReadSessionLocal() as session:
+            result = await session.stream(
+                select_post_rows()
+                .order_by(models.Post.id)
+                .execution_options(yield_per=settings.export_batch_size),
+            )
+            async for batch in result.partitions():
+                yield b"".join(dump_post_ndjson(row) for row in batch)
+                exported += len(batch)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            "Exported %d posts in %.3fs (%.1f rows/sec)",
+            exported,
+            elapsed,
+            exported / elapsed if elapsed else 0.0,
+        )
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_posts():
+    # Server-Sent Events: one PostEvent per message as posts are created,
+    # updated and deleted, so clients stop re-polling GET /api/posts.
+    if not feed_hub.running:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live feed is not available",
+        )
+
+    async def events():
+        async with feed_hub.subscribe() as subscription:
+            yield b"retry: 3000\n\n"
+            while messages := await subscription.get():
+                yield b"".join(message.sse for message in messages)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def close_on_disconnect(
+    websocket: WebSocket,
+    subscription: Subscription,
+) -> None:
+    # The feed never expects messages, but reading is how a client's close
+    # frame arrives; without it a quiet feed would hold the slot forever.
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+    subscription.close()
+
+
+@router.websocket("/stream")
+async def stream_posts_websocket(websocket: WebSocket):
+    # The same PostEvents as GET /api/posts/stream, one per text message.
+    if not feed_hub.running:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    await websocket.accept()
+    async with feed_hub.subscribe() as subscription:
+        watcher = asyncio.create_task(close_on_disconnect(websocket, subscription))
+        try:
+            while messages := await subscription.get():
+                for message in messages:
+                    if message.text:
+                        await websocket.send_text(message.text)
+        except WebSocketDisconnect:
+            return
+        finally:
+            watcher.cancel()
+    if watcher.done() and not watcher.cancelled():
+        return
+    if subscription.overflowed:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    else:
+        await websocket.close(code=status.WS_1012_SERVICE_RESTART)
+
+
+@router.get("/search", response_model=PostSearchPage)
+@cached(POSTS, USERS)
+async def search_posts(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    cursor: str | None = None,
+    limit: Annotated[
+        int,
+        Query(ge=1, le=settings.max_posts_per_page),
+    ] = settings.posts_per_page,
+):
+    if not search_supported(db.bind.dialect.name):
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search is not available on this database backend",
+        )
+    if not q.split():
+        # Nothing to match: FTS5 rejects an empty MATCH expression.
+        return build_search_page([], limit)
+    result = await db.execute(select_search_rows(q, cursor, limit))
+    return build_search_page(result.all(), limit)
 
 
 @router.get("/{post_id}", response_model=PostResponse)
+@cached(POSTS, USERS)
 async def get_post(post_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.id == post_id),
-    )
-    post = result.scalars().first()
-    if post:
-        return post
+    result = await db.execute(select_post_rows().where(models.Post.id == post_id))
+    row = result.first()
+    if row:
+        return post_row_to_response(row)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
 
@@ -57,7 +313,7 @@ async def get_post(post_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
 async def update_post_full(
     post_id: int,
     post_data: PostCreate,
-    current_user: CurrentUser,
+    current_user_id: CurrentUserId,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     result = await db.execute(select(models.Post).where(models.Post.id == post_id))
@@ -67,7 +323,7 @@ async def update_post_full(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found",
         )
-    if post.user_id != current_user.id:
+    if post.user_id != current_user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this post",
@@ -77,15 +333,18 @@ async def update_post_full(
     post.content = post_data.content
 
     await db.commit()
+    await response_cache.invalidate(POSTS)
     await db.refresh(post, attribute_names=["author"])
-    return post
+    response = PostResponse.model_validate(post)
+    await feed_hub.publish("updated", response)
+    return response
 
 
 @router.patch("/{post_id}", response_model=PostResponse)
 async def update_post_partial(
     post_id: int,
     post_data: PostUpdate,
-    current_user: CurrentUser,
+    current_user_id: CurrentUserId,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     result = await db.execute(select(models.Post).where(models.Post.id == post_id))
@@ -96,7 +355,7 @@ async def update_post_partial(
             detail="Post not found",
         )
 
-    if post.user_id != current_user.id:
+    if post.user_id != current_user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this post",
@@ -107,17 +366,25 @@ async def update_post_partial(
         setattr(post, field, value)
 
     await db.commit()
+    await response_cache.invalidate(POSTS)
     await db.refresh(post, attribute_names=["author"])
-    return post
+    response = PostResponse.model_validate(post)
+    await feed_hub.publish("updated", response)
+    return response
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(
     post_id: int,
-    current_user: CurrentUser,
+    current_user_id: CurrentUserId,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    result = await db.execute(select(models.Post).where(models.Post.id == post_id))
+    # The author comes along for the feed's "deleted" event.
+    result = await db.execute(
+        select(models.Post)
+        .options(joinedload(models.Post.author))
+        .where(models.Post.id == post_id),
+    )
     post = result.scalars().first()
     if not post:
         raise HTTPException(
@@ -125,11 +392,15 @@ async def delete_post(
             detail="Post not found",
         )
 
-    if post.user_id != current_user.id:
+    if post.user_id != current_user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to delete this post",
         )
 
+    deleted = PostResponse.model_validate(post)
     await db.delete(post)
+    await apply_post_counts(db, {current_user_id: -1})
     await db.commit()
+    await response_cache.invalidate(POSTS)
+    await feed_hub.publish("deleted", deleted)
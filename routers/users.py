@@ -1,83 +1,193 @@
-from datetime import timedelta
+from datetime import UTC, datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import func, select
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app import models
 from app.auth import (
     CurrentUser,
+    CurrentUserId,
     create_access_token,
-    hash_password,
-    verify_password,
+    create_refresh_token,
+    hash_password_async,
+    invalidate_cached_user,
+    verify_password_async,
+    verify_refresh_token,
 )
 from app.config import settings
-from app.database import get_db
-from app.schemas import PostResponse, Token, UserCreate, UserPrivate, UserPublic, UserUpdate
+from app.database import get_db, get_read_db
+from app.images import remove_profile_image, save_profile_image
+from app.pagination import build_page, paginate_posts
+from app.purge import post_purger
+from app.rate_limit import limit_login
+from app.response_cache import POSTS, USERS, CachedRoute, cached, response_cache
+from app.schemas import (
+    PostPage,
+    Token,
+    TokenRefresh,
+    UserCreate,
+    UserPrivate,
+    UserProfile,
+    UserUpdate,
+)
+from app.serializers import dump_post_page, post_row_to_response, select_post_rows
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
-@router.post("", response_model=UserPrivate, status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate, db: Annotated[AsyncSession, Depends(get_db)]):
-    result = await db.execute(
-        select(models.User).where(models.User.username == user.username),
-    )
-    existing_user = result.scalars().first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already exists",
-        )
+async def _find_conflict(
+    db: AsyncSession,
+    username: str | None,
+    email: str | None,
+    exclude_user_id: int | None = None,
+) -> str | None:
+    # One probe over the username and lower(email) unique indexes; returns
+    # which of the two is already taken by another account.
+    conditions = []
+    if username is not None:
+        conditions.append(models.User.username == username)
+    if email is not None:
+        conditions.append(func.lower(models.User.email) == func.lower(email))
+    if not conditions:
+        return None
+    stmt = select(models.User.username).where(or_(*conditions)).limit(1)
+    if exclude_user_id is not None:
+        stmt = stmt.where(models.User.id != exclude_user_id)
+    taken = (await db.execute(stmt)).scalar()
+    if taken is None:
+        return None
+    return "username" if taken == username else "email"
 
-    result = await db.execute(
-        select(models.User).where(func.lower(models.User.email) == user.email.lower()),
+
+def _conflict_error(conflict: str, email_detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Username already exists" if conflict == "username" else email_detail,
     )
-    existing_email = result.scalars().first()
-    if existing_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already exists",
-        )
+
+
+async def _commit_user(
+    db: AsyncSession,
+    username: str | None,
+    email: str | None,
+    email_detail: str,
+    user_id: int | None = None,
+) -> None:
+    # The unique indexes are what actually keep usernames and emails unique;
+    # a concurrent request can always take one between a check and the insert.
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        if user_id is not None:
+            # The rollback expired the edited row; don't let a cached copy
+            # of it outlive the failed update.
+            invalidate_cached_user(user_id)
+        conflict = await _find_conflict(db, username, email, user_id)
+        if conflict is None:
+            raise
+        raise _conflict_error(conflict, email_detail) from None
+
+
+@router.post("", response_model=UserPrivate, status_code=status.HTTP_201_CREATED)
+async def create_user(user: UserCreate, db: Annotated[AsyncSession, Depends(get_db)]):
+    # Checked up front as well so taken names are rejected before paying for
+    # an Argon2 hash.
+    conflict = await _find_conflict(db, user.username, user.email)
+    if conflict is not None:
+        raise _conflict_error(conflict, "Email already exists")
+    # Hand the write connection back while hashing; the insert takes it again.
+    await db.close()
 
     new_user = models.User(
         username=user.username,
         email=user.email,
-        password_hash=hash_password(user.password),
+        password_hash=await hash_password_async(user.password),
     )
     db.add(new_user)
-    await db.commit()
+    await _commit_user(db, user.username, user.email, "Email already exists")
     await db.refresh(new_user)
     return new_user
 
 
-@router.post("/token", response_model=Token)
+@router.post("/token", response_model=Token, dependencies=[Depends(limit_login)])
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     result = await db.execute(
         select(models.User).where(
-            func.lower(models.User.email) == form_data.username.lower(),
+            func.lower(models.User.email) == func.lower(form_data.username),
+            models.User.deleted_at.is_(None),
         ),
     )
     user = result.scalars().first()
+    # Don't hold the write connection through the Argon2 verify: on SQLite
+    # there is only one, and every other write would wait behind logins.
+    await db.close()
 
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password_async(
+        form_data.password,
+        user.password_hash,
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(
-        data={"sub": str(user.id)},
-        expires_delta=timedelta(minutes=settings.access_token_expire_minutes),
+    return _issue_tokens(user)
+
+
+def _issue_tokens(user: models.User) -> Token:
+    return Token(
+        access_token=create_access_token(user),
+        refresh_token=create_refresh_token(user),
+        token_type="bearer",
+    )
+
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(
+    body: TokenRefresh,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+):
+    # Reads the row rather than the user cache so the new claims pick up
+    # renames and revocations made on other workers.
+    claims = verify_refresh_token(body.refresh_token)
+    user = None
+    if claims is not None:
+        result = await db.execute(
+            select(models.User).where(models.User.id == claims.user_id),
+        )
+        user = result.scalars().first()
+    if not user or user.token_version != claims.version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _issue_tokens(user)
+
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(
+    current_user_id: CurrentUserId,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    # Signs the user out everywhere: every access and refresh token issued so
+    # far carries the old version.
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == current_user_id)
+        .values(token_version=models.User.token_version + 1),
     )
-    return Token(access_token=access_token, token_type="bearer")
+    await db.commit()
+    invalidate_cached_user(current_user_id)
 
 
 @router.get("/me", response_model=UserPrivate)
@@ -85,18 +195,38 @@ async def get_current_user(current_user: CurrentUser):
     return current_user
 
 
-@router.get("/{user_id}", response_model=UserPublic)
+@router.get("/{user_id}", response_model=UserProfile)
+@cached(POSTS, USERS)
 async def get_user(user_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    result = await db.execute(
+        select(models.User).where(
+            models.User.id == user_id,
+            models.User.deleted_at.is_(None),
+        ),
+    )
     user = result.scalars().first()
     if user:
         return user
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
 
-@router.get("/{user_id}/posts", response_model=list[PostResponse])
-async def get_user_posts(user_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
+@router.get("/{user_id}/posts", response_model=PostPage)
+@cached(POSTS, USERS)
+async def get_user_posts(
+    user_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    cursor: str | None = None,
+    limit: Annotated[
+        int,
+        Query(ge=1, le=settings.max_posts_per_page),
+    ] = settings.posts_per_page,
+):
+    result = await db.execute(
+        select(models.User).where(
+            models.User.id == user_id,
+            models.User.deleted_at.is_(None),
+        ),
+    )
     user = result.scalars().first()
     if not user:
         raise HTTPException(
@@ -105,12 +235,18 @@ async def get_user_posts(user_id: int, db: Annotated[AsyncSession, Depends(get_d
         )
 
     result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.user_id == user_id)
-        .order_by(models.Post.date_posted.desc()),
+        paginate_posts(
+            select_post_rows().where(models.Post.user_id == user_id),
+            cursor,
+            limit,
+        ),
     )
-    return result.scalars().all()
+    if settings.fast_post_lists:
+        return Response(
+            dump_post_page(result.all(), limit),
+            media_type="application/json",
+        )
+    return build_page([post_row_to_response(row) for row in result], limit)
 
 
 @router.patch("/{user_id}", response_model=UserPrivate)
@@ -134,34 +270,72 @@ async def update_user(
             detail="User not found",
         )
 
-    if user_update.username is not None and user_update.username != user.username:
-        result = await db.execute(
-            select(models.User).where(models.User.username == user_update.username),
-        )
-        if result.scalars().first():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already exists",
-            )
-
-    if user_update.email is not None and user_update.email != user.email:
-        result = await db.execute(
-            select(models.User).where(func.lower(models.User.email) == user_update.email.lower()),
-        )
-        if result.scalars().first():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered",
-            )
-
     if user_update.username is not None:
         user.username = user_update.username
     if user_update.email is not None:
         user.email = user_update.email
-    if user_update.image_file is not None:
-        user.image_file = user_update.image_file
 
+    await _commit_user(
+        db,
+        user_update.username,
+        user_update.email,
+        "Email already registered",
+        user_id,
+    )
+    invalidate_cached_user(user_id)
+    await response_cache.invalidate(USERS)
+    await db.refresh(user)
+    return user
+
+
+@router.put(
+    "/{user_id}/image",
+    response_model=UserPrivate,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    },
+                },
+            },
+        },
+    },
+)
+async def upload_profile_image(
+    user_id: int,
+    request: Request,
+    current_user: CurrentUser,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    if user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to update this user",
+        )
+
+    # The upload is streamed and resized before the row is touched, so the
+    # write connection isn't held while the body arrives and Pillow runs.
+    image_file = await save_profile_image(request, user_id)
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    user = result.scalars().first()
+    if not user:
+        remove_profile_image(image_file, user_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    previous_image = user.image_file
+    user.image_file = image_file
     await db.commit()
+    remove_profile_image(previous_image, user_id)
+    invalidate_cached_user(user_id)
+    await response_cache.invalidate(USERS)
     await db.refresh(user)
     return user
 
@@ -186,5 +360,13 @@ async def delete_user(
             detail="User not found",
         )
 
-    await db.delete(user)
+    # Deleting the posts row by row could hold the write lock for seconds on
+    # a prolific account. Marking the user hides the account and its posts
+    # right away and revokes its tokens; post_purger deletes the rest in
+    # bounded batches.
+    user.deleted_at = datetime.now(UTC)
+    user.token_version += 1
     await db.commit()
+    invalidate_cached_user(user_id)
+    await response_cache.invalidate(POSTS, USERS)
+    post_purger.schedule(user_id)
@@ -11,25 +11,20 @@ export async function getCurrentUser() {
     return fetchPromise;
   }
 
-  const token = localStorage.getItem("access_token");
-  if (!token) {
+  if (!localStorage.getItem("access_token")) {
     return null;
   }
 
   fetchPromise = (async () => {
     try {
-      const response = await fetch("/api/users/me", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
+      const response = await authFetch("/api/users/me");
 
       if (response.ok) {
         currentUser = await response.json();
         return currentUser;
       }
 
-      localStorage.removeItem("access_token");
+      clearTokens();
       return null;
     } catch (error) {
       console.error("Error fetching current user:", error);
@@ -42,8 +37,62 @@ export async function getCurrentUser() {
   return fetchPromise;
 }
 
-export function logout() {
+// fetch() with the access token attached. Access tokens are short-lived, so
+// on a 401 the token is renewed once and the request retried.
+export async function authFetch(url, options = {}) {
+  const send = () =>
+    fetch(url, {
+      ...options,
+      headers: { ...options.headers, Authorization: `Bearer ${getToken()}` },
+    });
+
+  const response = await send();
+  if (response.status === 401 && (await refreshAccessToken())) {
+    return send();
+  }
+  return response;
+}
+
+let refreshPromise = null;
+
+// Concurrent 401s share one refresh request rather than each sending its own.
+export function refreshAccessToken() {
+  if (!refreshPromise) {
+    refreshPromise = renewTokens().finally(() => {
+      refreshPromise = null;
+    });
+  }
+  return refreshPromise;
+}
+
+async function renewTokens() {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) {
+    return false;
+  }
+
+  const response = await fetch("/api/users/token/refresh", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ refresh_token: refreshToken }),
+  });
+  if (!response.ok) {
+    return false;
+  }
+
+  const data = await response.json();
+  localStorage.setItem("access_token", data.access_token);
+  localStorage.setItem("refresh_token", data.refresh_token);
+  return true;
+}
+
+function clearTokens() {
   localStorage.removeItem("access_token");
+  localStorage.removeItem("refresh_token");
+}
+
+export function logout() {
+  clearTokens();
   currentUser = null;
   window.location.href = "/";
 }
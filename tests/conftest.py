@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# app.config and app.database read their settings at import, so point them
+# at a throwaway database before any test imports the app.
+_tmp = Path(tempfile.mkdtemp(prefix="blog-tests-"))
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp / 'test.db'}"
+os.environ.pop("SQLALCHEMY_READ_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "test-only-secret-key-not-for-production")
+os.environ["MIGRATE_ON_STARTUP"] = "true"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+PASSWORD = "test-password"
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def posts(client) -> list[dict]:
+    # Two authors, so a feed that looked authors up per post would show it.
+    created = []
+    for username in ("alice", "bob"):
+        email = f"{username}@example.com"
+        client.post(
+            "/api/users",
+            json={"username": username, "email": email, "password": PASSWORD},
+        )
+        token = client.post(
+            "/api/users/token",
+            data={"username": email, "password": PASSWORD},
+        ).json()["access_token"]
+        for i in range(3):
+            response = client.post(
+                "/api/posts",
+                json={"title": f"{username} {i}", "content": "lorem ipsum"},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            created.append(response.json())
+    return created
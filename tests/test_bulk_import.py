@@ -0,0 +1,34 @@
+import json
+
+from tests.conftest import PASSWORD
+
+
+def test_imported_offsets_are_stored_as_utc(client):
+    email = "importer@example.com"
+    user = client.post(
+        "/api/users",
+        json={"username": "importer", "email": email, "password": PASSWORD},
+    ).json()
+    token = client.post(
+        "/api/users/token",
+        data={"username": email, "password": PASSWORD},
+    ).json()["access_token"]
+    lines = [
+        {"title": "midnight UTC", "date_posted": "2020-01-01T05:00:00+05:00"},
+        {"title": "3am UTC", "date_posted": "2020-01-01T03:00:00Z"},
+    ]
+    response = client.post(
+        "/api/posts/bulk",
+        content="\n".join(json.dumps({**line, "content": "x"}) for line in lines),
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/x-ndjson",
+        },
+    )
+    assert response.json()["inserted"] == 2, response.text
+
+    items = client.get(f"/api/users/{user['id']}/posts").json()["items"]
+    assert [(post["title"], post["date_posted"][:19]) for post in items] == [
+        ("3am UTC", "2020-01-01T03:00:00"),
+        ("midnight UTC", "2020-01-01T00:00:00"),
+    ]
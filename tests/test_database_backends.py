@@ -0,0 +1,232 @@
+import asyncio
+import glob
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+# The same smoke test against SQLite and PostgreSQL: migrations, keyset
+# pagination, the post stats and the purge. For PostgreSQL, set
+# TEST_POSTGRES_URL to a server whose user may create databases, or have
+# initdb and pg_ctl installed to start a throwaway one; otherwise it skips.
+
+
+def _postgres_bin(name: str) -> str | None:
+    found = shutil.which(name)
+    if found:
+        return found
+    candidates = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"))
+    return candidates[-1] if candidates else None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def postgres_server(tmp_path_factory):
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if url:
+        yield url
+        return
+
+    initdb, pg_ctl = _postgres_bin("initdb"), _postgres_bin("pg_ctl")
+    if initdb is None or pg_ctl is None:
+        pytest.skip("no PostgreSQL: set TEST_POSTGRES_URL or install initdb")
+    data = tmp_path_factory.mktemp("pgdata")
+    port = _free_port()
+    try:
+        subprocess.run(
+            [initdb, "-D", data, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+            check=True,
+            capture_output=True,
+        )
+        subprocess.run(
+            [
+                pg_ctl,
+                "-D",
+                data,
+                "-o",
+                f"-p {port} -h 127.0.0.1 -k {data}",
+                "-l",
+                data / "server.log",
+                "-w",
+                "start",
+            ],
+            check=True,
+            capture_output=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        pytest.skip(f"could not start PostgreSQL: {exc.stderr.decode().strip()}")
+    try:
+        yield f"postgresql+asyncpg://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run(
+            [pg_ctl, "-D", data, "-m", "immediate", "stop"],
+            capture_output=True,
+        )
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+async def db_engine(request, tmp_path):
+    from app.database import create_engines
+
+    if request.param == "sqlite":
+        engine, read_engine = create_engines(
+            f"sqlite+aiosqlite:///{tmp_path / 'backend.db'}",
+        )
+        yield engine
+        await read_engine.dispose()
+        await engine.dispose()
+        return
+
+    import asyncpg
+
+    server = make_url(request.getfixturevalue("postgres_server"))
+    name = f"blog_test_{secrets.token_hex(4)}"
+    admin_dsn = server.set(drivername="postgresql").render_as_string(
+        hide_password=False,
+    )
+    admin = await asyncpg.connect(admin_dsn)
+    await admin.execute(f'CREATE DATABASE "{name}"')
+    engine, _ = create_engines(
+        server.set(database=name).render_as_string(hide_password=False),
+    )
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+        await admin.execute(f'DROP DATABASE "{name}"')
+        await admin.close()
+
+
+@pytest.mark.anyio
+async def test_schema_and_queries(db_engine):
+    from app import models
+    from app.migrations import LATEST_VERSION, current_version, upgrade
+    from app.pagination import encode_cursor, paginate_posts
+    from app.purge import PostPurger
+    from app.serializers import select_post_rows
+    from app.user_stats import apply_post_counts, reconcile_user_stats
+
+    assert [step.version for step in await upgrade(db_engine)][-1] == LATEST_VERSION
+    assert await upgrade(db_engine) == []
+    async with db_engine.connect() as conn:
+        assert await current_version(conn) == LATEST_VERSION
+
+    sessions = async_sessionmaker(
+        db_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    async with sessions() as session:
+        alice = models.User(
+            username="alice",
+            email="Alice@example.com",
+            password_hash="",
+        )
+        bob = models.User(username="bob", email="bob@example.com", password_hash="")
+        session.add_all([alice, bob])
+        await session.flush()
+        # Pairs of posts share a timestamp, so pages have to split on id.
+        session.add_all(
+            models.Post(
+                title=f"post {i}",
+                content="lorem ipsum",
+                user_id=alice.id if i % 2 else bob.id,
+                date_posted=start + timedelta(minutes=i // 2),
+            )
+            for i in range(7)
+        )
+        await apply_post_counts(session, {alice.id: 3, bob.id: 4})
+        await session.commit()
+
+    async with sessions() as session:
+        titles = []
+        cursor = None
+        while True:
+            stmt = paginate_posts(select_post_rows(), cursor, 3)
+            rows = (await session.execute(stmt)).all()
+            titles += [row.title for row in rows[:3]]
+            if len(rows) <= 3:
+                break
+            cursor = encode_cursor(rows[2])
+        assert titles == [f"post {i}" for i in (6, 5, 4, 3, 2, 1, 0)]
+
+        found = await session.scalar(
+            select(models.User.username).where(
+                func.lower(models.User.email) == func.lower("ALICE@EXAMPLE.COM"),
+            ),
+        )
+        assert found == "alice"
+
+    async with db_engine.begin() as conn:
+        assert await reconcile_user_stats(conn) == 0
+        await conn.execute(update(models.User).values(post_count=0))
+        assert await reconcile_user_stats(conn) == 2
+
+    async with sessions() as session:
+        bob = await session.get(models.User, bob.id)
+        assert (bob.post_count, bob.last_posted_at is not None) == (4, True)
+        bob.deleted_at = datetime.now(UTC)
+        await session.commit()
+
+    assert await PostPurger(2, 0, 0, session_factory=sessions).purge(bob.id) == 4
+    async with sessions() as session:
+        assert await session.get(models.User, bob.id) is None
+        remaining = await session.scalars(select(models.Post.user_id).distinct())
+        assert list(remaining) == [alice.id]
+
+
+@pytest.mark.anyio
+async def test_purge_outlasts_late_posts(db_engine):
+    from app import models
+    from app.migrations import upgrade
+    from app.purge import PostPurger
+
+    await upgrade(db_engine)
+    sessions = async_sessionmaker(
+        db_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    async with sessions() as session:
+        user = models.User(
+            username="carol",
+            email="carol@example.com",
+            password_hash="",
+            deleted_at=datetime.now(UTC),
+        )
+        session.add(user)
+        await session.flush()
+        session.add(models.Post(title="early", content="x", user_id=user.id))
+        await session.commit()
+
+    async def late_post():
+        # A worker that still trusts a cached token version.
+        await asyncio.sleep(0.1)
+        async with sessions() as session:
+            session.add(models.Post(title="late", content="x", user_id=user.id))
+            await session.commit()
+
+    purger = PostPurger(10, 0, grace_seconds=0.3, session_factory=sessions)
+    deleted, _ = await asyncio.gather(purger.purge(user.id), late_post())
+    assert deleted == 2
+    async with sessions() as session:
+        assert await session.get(models.User, user.id) is None
+        assert await session.scalar(select(func.count(models.Post.id))) == 0
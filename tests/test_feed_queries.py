@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+
+@contextmanager
+def counted_queries():
+    from app.database import engine, read_engine
+
+    statements = []
+
+    def record(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    engines = {engine.sync_engine, read_engine.sync_engine}
+    for counted_engine in engines:
+        event.listen(counted_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for counted_engine in engines:
+            event.remove(counted_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize("path", ["/", "/api/posts", "/api/posts?limit=2"])
+def test_feed_page_is_one_query(client, posts, path):
+    with counted_queries() as statements:
+        response = client.get(path)
+    assert response.status_code == 200
+    assert len(statements) == 1, statements
+
+
+def test_next_feed_page_is_one_query(client, posts):
+    cursor = client.get("/api/posts?limit=2").json()["next_cursor"]
+    with counted_queries() as statements:
+        response = client.get("/api/posts", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 200
+    assert [post["title"] for post in response.json()["items"]] == [
+        post["title"] for post in reversed(posts)
+    ][2:4]
+    assert len(statements) == 1, statements